@@ -0,0 +1,243 @@
+"""Offline benchmark for title parsing and MusicBrainz matching.
+
+Replays recorded yt-dlp info records and MusicBrainz `search_recordings`
+responses from fixtures/matching.jsonl through `parse_video_info` and
+`lookup_metadata`, without touching the network, and reports:
+
+  - throughput (titles/s) of parsing, scoring and the whole lookup
+  - match accuracy against the expected outcome of every fixture
+  - regressions against a saved baseline run
+
+Usage (from the repository root):
+
+    python benchmarks/bench_matching.py             # run, compare with baseline
+    python benchmarks/bench_matching.py --save      # run, store as the baseline
+    python benchmarks/bench_matching.py --record queries.txt
+        # record new fixtures from live YouTube/MusicBrainz (needs network);
+        # the expected outcome is today's result, so review it by hand
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from muse import metadata  # noqa: E402
+from muse.downloader import parse_video_info  # noqa: E402
+from muse.engine import _INFO_FIELDS  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures", "matching.jsonl")
+BASELINE = os.path.join(HERE, ".baseline_matching.json")
+
+FIELDS = ("artist", "title", "album", "year")
+ROUNDS = 5               # timed rounds per throughput figure
+ROUND_SECONDS = 0.2      # minimum length of one round
+SLOWDOWN_LIMIT = 0.20    # throughput drop reported as a regression
+
+
+def load_cases(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _throughput(func, items) -> float:
+    """Best items/s of `func` over `items` across ROUNDS timed rounds; the
+    best round is the one least disturbed by the rest of the machine."""
+    best = 0.0
+    for _ in range(ROUNDS):
+        done = 0
+        start = time.perf_counter()
+        while True:
+            for item in items:
+                func(item)
+            done += len(items)
+            elapsed = time.perf_counter() - start
+            if elapsed >= ROUND_SECONDS:
+                break
+        best = max(best, done / elapsed)
+    return best
+
+
+def _offline_lookup(cases: list):
+    """Serve `search_recordings` from the fixtures instead of the network."""
+    responses = {}
+    for case in cases:
+        artist, title, _, is_cover = parse_video_info(case["info"])
+        responses[(artist, title, is_cover)] = case["mb"].get("recording-list", [])
+
+    metadata._cache = None
+    metadata._search_recordings = lambda artist, title, is_cover: \
+        responses.get((artist, title, is_cover), [])
+
+
+def _match(case: dict) -> dict:
+    artist, title, _, is_cover = parse_video_info(case["info"])
+    mb = metadata.lookup_metadata(artist, title, is_cover=is_cover, info=case["info"])
+    return {
+        "artist": mb.get("artist") or artist,
+        "title":  mb.get("title") or title,
+        "album":  mb.get("album") or "",
+        "year":   mb.get("year") or "",
+    }
+
+
+def run(cases: list) -> dict:
+    _offline_lookup(cases)
+
+    # ── Accuracy ─────────────────────────────────────────────────────────────
+    results = {}
+    field_hits = dict.fromkeys(FIELDS, 0)
+    for case in cases:
+        got = _match(case)
+        wrong = [f for f in FIELDS if got[f] != case["expected"][f]]
+        for f in FIELDS:
+            field_hits[f] += f not in wrong
+        results[case["name"]] = {"ok": not wrong, "got": got, "wrong": wrong}
+
+    # ── Throughput ───────────────────────────────────────────────────────────
+    infos = [case["info"] for case in cases]
+    scoring = []
+    for case in cases:
+        artist, title, _, is_cover = parse_video_info(case["info"])
+        scoring.append((case["mb"].get("recording-list", []), title, artist, is_cover))
+
+    throughput = {
+        "parse":   _throughput(parse_video_info, infos),
+        "scoring": _throughput(lambda args: metadata._pick_best_recording(*args), scoring),
+        "lookup":  _throughput(_match, cases),
+    }
+
+    n = len(cases)
+    return {
+        "cases": n,
+        "accuracy": sum(r["ok"] for r in results.values()) / n if n else 0.0,
+        "field_accuracy": {f: field_hits[f] / n if n else 0.0 for f in FIELDS},
+        "throughput": throughput,
+        "results": results,
+    }
+
+
+def report(run_result: dict, cases: list):
+    print(f"Matching benchmark — {run_result['cases']} fixtures\n")
+    print("Throughput (titles/s)")
+    for name, value in run_result["throughput"].items():
+        print(f"  {name:<8} {value:>12,.0f}")
+
+    print(f"\nAccuracy  {run_result['accuracy']:.1%} exact")
+    for f, value in run_result["field_accuracy"].items():
+        print(f"  {f:<8} {value:.1%}")
+
+    expected = {c["name"]: c["expected"] for c in cases}
+    misses = [(name, r) for name, r in run_result["results"].items() if not r["ok"]]
+    if misses:
+        print("\nMismatches")
+        for name, r in misses:
+            print(f"  {name}")
+            for f in r["wrong"]:
+                print(f"    {f}: got {r['got'][f]!r}, expected {expected[name][f]!r}")
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Regressions of `current` against `baseline`, as readable lines."""
+    problems = []
+    for name, value in current["throughput"].items():
+        before = baseline.get("throughput", {}).get(name)
+        if before:
+            change = value / before - 1
+            print(f"  {name:<8} {before:>12,.0f} → {value:>12,.0f}  ({change:+.1%})")
+            if change < -SLOWDOWN_LIMIT:
+                problems.append(f"{name} throughput dropped {-change:.1%}")
+
+    before = baseline.get("accuracy", 0.0)
+    print(f"  accuracy {before:>12.1%} → {current['accuracy']:>12.1%}")
+    for name, r in current["results"].items():
+        was = baseline.get("results", {}).get(name)
+        if was and was["ok"] and not r["ok"]:
+            problems.append(f"'{name}' no longer matches ({', '.join(r['wrong'])})")
+    return problems
+
+
+# ── Recording fixtures ───────────────────────────────────────────────────────
+
+def record(queries_file: str, out_path: str):
+    """Capture live info records and MusicBrainz responses for each line of
+    `queries_file` (a search query or a URL)."""
+    from muse.engine import get_engine
+
+    engine = get_engine()
+    with open(queries_file, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    with open(out_path, "a", encoding="utf-8") as out:
+        for query in queries:
+            if query.startswith(("http://", "https://")):
+                raw = engine.extract_info(query)
+            else:
+                entries = engine.search(query, 1)
+                if not entries:
+                    print(f"no results: {query}")
+                    continue
+                raw = engine.extract_info(
+                    f"https://www.youtube.com/watch?v={entries[0]['id']}"
+                )
+            info = {field: raw.get(field) for field in _INFO_FIELDS}
+
+            artist, title, _, is_cover = parse_video_info(info)
+            recordings = metadata._search_recordings(artist, title, is_cover)
+            if recordings is None:
+                print(f"MusicBrainz request failed: {query}")
+                continue
+
+            case = {"name": query, "info": info,
+                    "mb": {"recording-list": recordings,
+                           "recording-count": len(recordings)}}
+            metadata._cache = None
+            case["expected"] = _match(case)
+            out.write(json.dumps(case, ensure_ascii=False) + "\n")
+            print(f"recorded: {query} → {case['expected']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true",
+                        help="store this run as the baseline")
+    parser.add_argument("--record", metavar="QUERIES",
+                        help="record fixtures for each query/URL in this file")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.fixtures)
+        return 0
+
+    cases = load_cases(args.fixtures)
+    current = run(cases)
+    report(current, cases)
+
+    status = 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\nAgainst baseline")
+        problems = compare(current, baseline)
+        if problems:
+            print("\nRegressions")
+            for p in problems:
+                print(f"  {p}")
+            status = 1
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline saved to {os.path.relpath(args.baseline)}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Startup benchmark for muse-cli.
+
+Measures, in fresh interpreters:
+
+  - import time of muse.__main__ (`python -X importtime`), with the slowest
+    modules it pulls in
+  - wall time from launch to the first `>>>` prompt of interactive mode,
+    using a throwaway config so nothing touches ~/.config/muse-cli
+
+and fails when a budget is exceeded or when one of the heavy optional
+dependencies is imported at startup instead of on first use.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_startup.py            # 5 runs each
+    python benchmarks/bench_startup.py --runs 20
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 120   # import of muse.__main__
+PROMPT_BUDGET_MS = 400   # launch to first ">>>", interpreter start included
+PROMPT_TIMEOUT = 30
+
+# Must only be imported when they are first needed
+LAZY_MODULES = ("yt_dlp", "mutagen", "lyricsgenius", "requests",
+                "PIL", "numpy", "blake3")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _run_importtime() -> list:
+    """[(module, self_us, cumulative_us, depth)] for one `import muse.__main__`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import muse.__main__"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)),
+                         len(m.group(3)) // 2))
+    return rows
+
+
+def import_time(runs: int) -> dict:
+    totals = []
+    for _ in range(runs):
+        rows = _run_importtime()
+        totals.append(next(cum for name, _, cum, _ in rows if name == "muse.__main__"))
+    slowest = sorted(
+        (r for r in rows if r[3] <= 2), key=lambda r: r[2], reverse=True
+    )[1:11]
+    return {
+        "median_ms": statistics.median(totals) / 1000,
+        "slowest": [(name, cum / 1000) for name, _, cum, _ in slowest],
+        "eager": sorted({
+            name.split(".")[0] for name, *_ in rows
+            if name.split(".")[0] in LAZY_MODULES
+        }),
+    }
+
+
+def _prepare_home(home: str):
+    config_dir = os.path.join(home, ".config", "muse-cli")
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, "config.json"), "w") as f:
+        json.dump({
+            "first_launch": False,
+            "deps_verified": True,
+            "output_base": os.path.join(home, "Music"),
+            "genius_token": "benchmark-token",
+        }, f)
+
+
+def _time_to_prompt(home: str) -> float:
+    env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "muse"], cwd=home, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    output = b""
+    try:
+        while b">>>" not in output:
+            chunk = os.read(proc.stdout.fileno(), 4096)
+            if not chunk:
+                raise RuntimeError("muse-cli exited before showing a prompt")
+            output += chunk
+            if time.perf_counter() - start > PROMPT_TIMEOUT:
+                raise RuntimeError("no prompt after %ds" % PROMPT_TIMEOUT)
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.stdin.close()       # EOF: interactive mode shuts down cleanly
+        try:
+            proc.wait(timeout=PROMPT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return elapsed * 1000
+
+
+def prompt_time(runs: int) -> dict:
+    home = tempfile.mkdtemp(prefix="muse-startup-")
+    try:
+        _prepare_home(home)
+        _time_to_prompt(home)    # first run creates the databases
+        times = [_time_to_prompt(home) for _ in range(runs)]
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return {
+        "median_ms": statistics.median(times),
+        "interpreter_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = import_time(args.runs)
+    prompt = prompt_time(args.runs)
+
+    print(f"Startup benchmark — median of {args.runs} runs\n")
+    print(f"  import muse.__main__  {imports['median_ms']:7.1f} ms"
+          f"  (budget {IMPORT_BUDGET_MS} ms)")
+    print(f"  first >>> prompt      {prompt['median_ms']:7.1f} ms"
+          f"  (budget {PROMPT_BUDGET_MS} ms, bare interpreter "
+          f"{prompt['interpreter_ms']:.0f} ms)")
+    print("\nSlowest imports")
+    for name, ms in imports["slowest"]:
+        print(f"  {name:<32} {ms:7.1f} ms")
+
+    problems = []
+    if imports["median_ms"] > IMPORT_BUDGET_MS:
+        problems.append(f"import takes {imports['median_ms']:.0f} ms")
+    if prompt["median_ms"] > PROMPT_BUDGET_MS:
+        problems.append(f"first prompt after {prompt['median_ms']:.0f} ms")
+    for name in imports["eager"]:
+        problems.append(f"{name} is imported at startup")
+    if problems:
+        print("\nOver budget")
+        for p in problems:
+            print(f"  {p}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
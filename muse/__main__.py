@@ -1,17 +1,24 @@
 import sys
 import os
-import queue
 import threading
 import shutil
 import platform
 
-from .config import first_launch_setup, get_config, interactive_config, CONFIG_DIR
+from .config import first_launch_setup, get_config, interactive_config, CONFIG_DIR, MAX_JOBS
 from .utils import check_dependencies
 from .banner import print_banner, STATUS_ROW, BANNER_HEIGHT
-from .search import search_youtube, display_search_results
+from .search import search_youtube, display_search_results, BulkSearch
 from .downloader import download_song
+from .pipeline import SongPipeline
+from .prefetch import Prefetcher, DEFAULT_LOOKAHEAD
+from .engine import set_engine
+from . import cover
+from . import metadata
+from . import ratelimit
+from . import search
 from .duplicate import DuplicateChecker
-from .lyrics import LyricsManager
+from .lyrics import LyricsManager, DEFAULT_CONCURRENCY
+from .cache import DiskCache
 from .colors import CYAN, WHITE, GREEN, RED, RESET, YELLOW, DIM
 
 
@@ -22,9 +29,15 @@ from .colors import CYAN, WHITE, GREEN, RED, RESET, YELLOW, DIM
 # off-screen, so we redraw it.
 _lines_below_banner = 0
 
+# Number of status rows in the banner — one per pipeline worker.
+_status_rows = 1
 
-def _compact_line(text):
-    """Overwrite the banner status line (row 9) using absolute positioning.
+# Serializes cursor save/move/restore sequences between worker threads.
+_output_lock = threading.Lock()
+
+
+def _compact_line(text, slot=0):
+    """Overwrite a banner status line (row 9 + slot) using absolute positioning.
 
     Uses DECSC / DECRC (ESC 7 / ESC 8) for save-restore — more reliable
     across terminals than the SCO sequences (CSI s / CSI u).
@@ -32,8 +45,9 @@ def _compact_line(text):
     cols = shutil.get_terminal_size((80, 24)).columns
     truncated = text[:cols - 1] if len(text) >= cols else text
     padding = " " * max(0, cols - len(truncated) - 1)
-    sys.stdout.write(f"\0337\033[{STATUS_ROW};1H{truncated}{padding}\0338")
-    sys.stdout.flush()
+    with _output_lock:
+        sys.stdout.write(f"\0337\033[{STATUS_ROW + slot};1H{truncated}{padding}\0338")
+        sys.stdout.flush()
 
 
 def _read_input(prompt):
@@ -53,13 +67,16 @@ def _maybe_redraw_banner(stats):
     """Redraw the banner if it's about to scroll off-screen."""
     global _lines_below_banner
     rows = shutil.get_terminal_size((80, 24)).lines
+    banner_height = BANNER_HEIGHT + _status_rows - 1
     # Redraw when the output area is nearly full
-    if _lines_below_banner >= rows - BANNER_HEIGHT - 2:
-        print_banner()
-        # Update status line with current progress if available
-        current = stats.get("current_status")
-        if current:
-            _compact_line(current)
+    if _lines_below_banner >= rows - banner_height - 2:
+        print_banner(_status_rows)
+        # Update status lines with current progress if available
+        with stats["lock"]:
+            current = list(stats["current_status"])
+        for slot, line in enumerate(current):
+            if line:
+                _compact_line(line, slot)
         _lines_below_banner = 0
 
 
@@ -70,79 +87,68 @@ def _tracked_print(*args, **kwargs):
     _lines_below_banner += 1
 
 
-def _queue_worker(q, config, duplicate_checker, lyrics_manager, stats):
-    """Daemon thread: pulls items from the queue and downloads sequentially."""
-    while True:
-        item = q.get()
-        if item is None:
-            q.task_done()
-            break
-
-        entry = item["entry"]
-        user_query = item["user_query"]
-
-        def compact_cb(stage, detail):
-            icon = {"searching": "⏳", "found": "⏳", "metadata": "⏳",
-                    "downloading": "⏳", "lyrics": "⏳",
-                    "done": "✅", "skip": "⏭️ ", "error": "❌"}.get(stage, "⏳")
-            pending = q.qsize()
-            suffix = f"  [{pending} pending]" if pending > 0 else ""
-            line = f"{icon} {detail}{suffix}"
-            stats["current_status"] = line
-            _compact_line(line)
-
-        download_succeeded = False
-        try:
-            if entry.startswith(("http://", "https://", "www.")):
-                url = entry
-                if url.startswith("www."):
-                    url = "https://" + url
-                download_song(
-                    url,
-                    config["output_base"],
-                    duplicate_checker,
-                    lyrics_manager,
-                    user_query=user_query,
-                    audio_format=config["audio_format"],
-                    batch_mode=True,
-                    on_progress=compact_cb,
-                )
-                download_succeeded = True
-            else:
-                compact_cb("searching", f"searching: {entry}")
-                results = search_youtube(entry, max_results=1)
-                if results:
-                    top = results[0]
-                    compact_cb("found", f"{top['title']} · found, downloading...")
-                    download_song(
-                        top["url"],
-                        config["output_base"],
-                        duplicate_checker,
-                        lyrics_manager,
-                        user_query=entry,
-                        audio_format=config["audio_format"],
-                        batch_mode=True,
-                        on_progress=compact_cb,
-                    )
-                    download_succeeded = True
-                else:
-                    compact_cb("error", f"{entry} · no results found")
-        except KeyboardInterrupt:
-            q.task_done()
-            return
-        except Exception as e:
-            compact_cb("error", f"{entry} · {e}")
+def _set_status(stats, slot, line):
+    """Record and draw the status line owned by worker `slot`."""
+    with stats["lock"]:
+        stats["current_status"][slot] = line
+    _compact_line(line, slot)
+
 
-        if download_succeeded:
+def _pipeline_status(stats, slot, stage, detail):
+    """SongPipeline status callback: each worker draws on its own row."""
+    pipeline = stats["pipeline"]
+    icon = {"searching": "⏳", "found": "⏳", "metadata": "⏳",
+            "downloading": "⏳", "lyrics": "⏳",
+            "done": "✅", "skip": "⏭️ ", "error": "❌"}.get(stage, "⏳")
+    pending = pipeline.qsize()
+    suffix = f"  [{pending} pending]" if pending > 0 else ""
+    width = max(len(label) for label in pipeline.slot_labels)
+    prefix = f"{pipeline.slot_labels[slot]:<{width}} │ " if _status_rows > 1 else ""
+    _set_status(stats, slot, f"{prefix}{icon} {detail}{suffix}")
+
+
+def _pipeline_finished(stats, job, ok):
+    """SongPipeline finish callback: count songs, show the session summary."""
+    with stats["lock"]:
+        if ok:
             stats["completed"] += 1
-        q.task_done()
+        n = stats["completed"]
+    # Once nothing is queued or in flight, show the session summary
+    if stats["pipeline"].pending() == 0:
+        line = f"✅ {n} song{'s' if n != 1 else ''} downloaded this session"
+        for other in range(_status_rows):
+            _set_status(stats, other, line if other == 0 else "")
 
-        # If queue is empty, show session summary on the status line
-        if q.empty():
-            n = stats["completed"]
-            line = f"✅ {n} song{'s' if n != 1 else ''} downloaded this session"
-            stats["current_status"] = line
-            _compact_line(line)
+
+def _parse_jobs(args):
+    """Pull `--jobs N` / `--jobs=N` out of the argument list.
+
+    Returns (remaining_args, jobs) where jobs is None when the flag is absent.
+    """
+    remaining = []
+    jobs = None
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = None
+        if arg == "--jobs":
+            if i + 1 >= len(args):
+                print(f"{RED}❌ --jobs needs a number{RESET}")
+                sys.exit(1)
+            value = args[i + 1]
+            i += 2
+        elif arg.startswith("--jobs="):
+            value = arg.split("=", 1)[1]
+            i += 1
+        else:
+            remaining.append(arg)
+            i += 1
+            continue
+        if not value.isdigit() or not 1 <= int(value) <= MAX_JOBS:
+            print(f"{RED}❌ --jobs must be a number between 1 and {MAX_JOBS}{RESET}")
+            sys.exit(1)
+        jobs = int(value)
+    return remaining, jobs
 
 
 # ── Batch mode (--batch flag) — unchanged ─────────────────────────────────────
@@ -190,8 +196,23 @@ def _process_batch(entries: list[str], config, duplicate_checker, lyrics_manager
 
     print(f"\n{CYAN}Processing {len(entries)} songs...{RESET}\n")
 
+    # Every query is searched in one background yt-dlp run; each song waits
+    # only for its own result
+    queries = [e for e in entries if not e.startswith(("http://", "https://", "www."))]
+    search = BulkSearch(queries).search if queries else search_youtube
+
+    # Songs further down the list are looked up while earlier ones download
+    lookahead = config.get("prefetch", DEFAULT_LOOKAHEAD)
+    prefetcher = (Prefetcher(duplicate_checker, lyrics_manager, lookahead, search=search)
+                  if lookahead else None)
+    if prefetcher:
+        for entry in entries:
+            is_url = entry.startswith(("http://", "https://", "www."))
+            prefetcher.add(entry, "" if is_url else entry)
+
     for i, entry in enumerate(entries, 1):
         print(f"{CYAN}[{i}/{len(entries)}]{RESET} {entry}")
+        pre = prefetcher.take(entry) if prefetcher else None
 
         if entry.startswith(("http://", "https://", "www.")):
             url = entry
@@ -205,9 +226,14 @@ def _process_batch(entries: list[str], config, duplicate_checker, lyrics_manager
                 user_query="",
                 audio_format=config["audio_format"],
                 batch_mode=True,
+                info=pre.get("info") if pre else None,
+                prefetched=pre,
             )
         else:
-            results = search_youtube(entry, max_results=1)
+            if pre and pre.get("search_result"):
+                results = [pre["search_result"]]
+            else:
+                results = search(entry, max_results=1)
             if results:
                 top = results[0]
                 print(f"{GREEN}Found:{RESET} {top['title']}  {CYAN}by{RESET} {top['uploader']}")
@@ -219,13 +245,30 @@ def _process_batch(entries: list[str], config, duplicate_checker, lyrics_manager
                     user_query=entry,
                     audio_format=config["audio_format"],
                     batch_mode=True,
+                    info=top["info"],
+                    prefetched=pre,
                 )
             else:
                 print(f"{RED}No results found{RESET}")
 
         print()
 
+    if prefetcher:
+        prefetcher.close()
+
     print(f"{GREEN}✅ Batch complete — processed {len(entries)} songs{RESET}")
+    _print_request_stats()
+
+
+def _print_request_stats():
+    """One line per web service that needed retries or was throttled."""
+    if "muse.sessions" not in sys.modules:   # no web request was made
+        return
+    from .sessions import stats
+    for service, counts in sorted(stats().items()):
+        if counts["retries"] or counts["throttled"]:
+            print(f"{DIM}   {service}: {counts['requests']} requests, "
+                  f"{counts['retries']} retried, {counts['throttled']} throttled{RESET}")
 
 
 def _handle_uninstall():
@@ -346,11 +389,13 @@ def _handle_uninstall():
 def main():
     """Main entry point."""
 
-    if len(sys.argv) > 1 and sys.argv[1] == "--uninstall":
+    args, jobs_override = _parse_jobs(sys.argv[1:])
+
+    if args and args[0] == "--uninstall":
         _handle_uninstall()
         return
 
-    if len(sys.argv) > 1 and sys.argv[1] == "--update":
+    if args and args[0] == "--update":
         import subprocess
         print(f"{CYAN}🔄 Updating muse-cli from GitHub...{RESET}")
         try:
@@ -364,11 +409,21 @@ def main():
             print(f"{RED}❌ Update failed. Try manually: pipx install --force git+https://github.com/Ulasti/muse-cli.git{RESET}")
         return
 
-    if len(sys.argv) > 1 and sys.argv[1] == "--config":
+    if args and args[0] == "--config":
         interactive_config()
         return
 
-    is_batch = len(sys.argv) > 1 and sys.argv[1] == "--batch"
+    if args and args[0] == "--import-mb":
+        if len(args) < 2:
+            print(f"{YELLOW}Usage: muse-cli --import-mb <release.tar.xz>{RESET}")
+            return
+        from .config import ensure_config_dir
+        from .mbindex import import_dump
+        ensure_config_dir()
+        import_dump(args[1], os.path.join(CONFIG_DIR, "musicbrainz.db"))
+        return
+
+    is_batch = args and args[0] == "--batch"
 
     config = first_launch_setup()
     if not config.get("deps_verified"):
@@ -377,8 +432,27 @@ def main():
         from .config import save_config
         save_config(config)
 
-    lyrics_manager   = LyricsManager(config["genius_token"])
-    duplicate_checker = DuplicateChecker(CONFIG_DIR, output_base=config["output_base"])
+    ratelimit.configure(CONFIG_DIR, config.get("rate_limits"))
+    set_engine(config.get("engine", "auto"))
+    cover.configure(target_size=config.get("cover_size", 1000))
+    cache_path  = os.path.join(CONFIG_DIR, "cache.db")
+    cache_bytes = config.get("cache_max_mb", 128) * 1024 * 1024
+    metadata.configure_cache(cache_path, max_bytes=cache_bytes)
+    search.configure_cache(cache_path, max_bytes=cache_bytes)
+    if config.get("metadata_backend") == "local":
+        if not metadata.configure_index(os.path.join(CONFIG_DIR, "musicbrainz.db")):
+            print(f"{YELLOW}⚠  No local MusicBrainz index — run muse-cli --import-mb <dump>{RESET}")
+    lyrics_manager   = LyricsManager(
+        config["genius_token"],
+        cache=DiskCache(cache_path, "lyrics", max_bytes=cache_bytes),
+        concurrency=config.get("lyrics_concurrency", DEFAULT_CONCURRENCY),
+        artist_cache=DiskCache(cache_path, "genius_artists", max_bytes=cache_bytes),
+    )
+    duplicate_checker = DuplicateChecker(
+        CONFIG_DIR, output_base=config["output_base"],
+        use_fingerprints=config.get("fingerprint", True),
+        hash_algorithm=config.get("hash_algorithm", "sha256"),
+    )
 
     try:
         os.makedirs(config["output_base"], exist_ok=True)
@@ -386,6 +460,12 @@ def main():
         print(f"{RED}❌ Failed to create output directory: {e}{RESET}")
         sys.exit(1)
 
+    # ── Library rescan (--rescan flag) ───────────────────────────────────
+    if args and args[0] == "--rescan":
+        from .rescan import rescan_library
+        rescan_library(duplicate_checker, config["output_base"])
+        return
+
     # ── Batch mode (--batch flag) ────────────────────────────────────────
     if is_batch:
         entries = _collect_batch_entries()
@@ -393,8 +473,8 @@ def main():
         return
 
     # ── Non-interactive single-shot mode ─────────────────────────────────
-    if len(sys.argv) > 1:
-        query = " ".join(sys.argv[1:]).strip()
+    if args:
+        query = " ".join(args).strip()
         if query:
             if query.startswith(("http://", "https://", "www.")):
                 if query.startswith("www."):
@@ -420,7 +500,8 @@ def main():
                         duplicate_checker,
                         lyrics_manager,
                         user_query=query,
-                        audio_format=config["audio_format"]
+                        audio_format=config["audio_format"],
+                        info=top["info"],
                     )
                 else:
                     print(f"{RED}No results found{RESET}")
@@ -428,19 +509,23 @@ def main():
         return
 
     # ── Interactive queue mode ────────────────────────────────────────────
-    global _lines_below_banner
-    print_banner()
-    _lines_below_banner = 0
-
-    stats = {"completed": 0, "current_status": None}
-    q = queue.Queue()
-
-    worker = threading.Thread(
-        target=_queue_worker,
-        args=(q, config, duplicate_checker, lyrics_manager, stats),
-        daemon=True,
+    global _lines_below_banner, _status_rows
+    jobs = jobs_override or config.get("jobs", 1)
+    jobs = max(1, min(int(jobs), MAX_JOBS))
+
+    stats = {"completed": 0, "lock": threading.Lock()}
+    pipeline = SongPipeline(
+        config, duplicate_checker, lyrics_manager,
+        stage_workers={"download": jobs},
+        on_status=lambda slot, stage, detail: _pipeline_status(stats, slot, stage, detail),
+        on_finished=lambda job, ok: _pipeline_finished(stats, job, ok),
     )
-    worker.start()
+    stats["pipeline"] = pipeline
+    stats["current_status"] = [None] * pipeline.worker_count
+    _status_rows = pipeline.worker_count
+    print_banner(_status_rows)
+    _lines_below_banner = 0
+    pipeline.start()
 
     try:
         while True:
@@ -450,12 +535,12 @@ def main():
             _lines_below_banner += 1  # the prompt + typed text counts as a line
 
             if user_input is None:   # EOF
-                # Graceful shutdown: enqueue sentinel so worker finishes
-                # pending work, wait for all tasks to complete, then join.
+                # Graceful shutdown: let the pipeline finish pending work,
+                # then stop every stage's workers.
                 _tracked_print(f"\n{CYAN}EOF received — shutting down after pending jobs...{RESET}")
-                q.put(None)  # one sentinel per worker
-                q.join()
-                worker.join()
+                pipeline.wait_idle()
+                pipeline.close()
+                _print_request_stats()
                 break
             if not user_input:
                 continue
@@ -463,12 +548,14 @@ def main():
             # ── Batch sub-mode ────────────────────────────────────────────
             if user_input.lower() == "batch":
                 entries = _collect_batch_entries()
-                # Enqueue each collected entry to the worker queue so
-                # all processing goes through the single `_queue_worker`
+                # Enqueue each collected entry to the pipeline so all
+                # processing goes through the same stage workers
                 if entries:
-                    for fl in entries:
-                        q.put({"entry": fl, "user_query": fl if not fl.startswith(("http://", "https://", "www.")) else ""})
-                    pending = q.qsize()
+                    pipeline.put_many([
+                        {"entry": fl, "user_query": fl if not fl.startswith(("http://", "https://", "www.")) else ""}
+                        for fl in entries
+                    ])
+                    pending = pipeline.pending()
                     _tracked_print(f"📦 Queued {len(entries)} songs [{pending} pending]")
                 else:
                     _tracked_print(f"{YELLOW}No entries to process.{RESET}")
@@ -498,8 +585,9 @@ def main():
                             idx = int(choice)
                             if 1 <= idx <= len(results):
                                 selected = results[idx - 1]
-                                q.put({"entry": selected["url"], "user_query": query})
-                                pending = q.qsize()
+                                pipeline.put({"entry": selected["url"], "user_query": query,
+                                              "info": selected["info"]})
+                                pending = pipeline.pending()
                                 _tracked_print(f"⏳ Queued: {selected['title']} [{pending} pending]")
                                 break
                             else:
@@ -520,10 +608,10 @@ def main():
                     with open(candidate, 'r') as f:
                         file_lines = [l.strip() for l in f if l.strip()]
                     if file_lines:
-                        for fl in file_lines:
-                            q.put({"entry": fl, "user_query": fl})
+                        pipeline.put_many([{"entry": fl, "user_query": fl}
+                                           for fl in file_lines])
                         fname = os.path.basename(candidate)
-                        pending = q.qsize()
+                        pending = pipeline.pending()
                         _tracked_print(f"📦 Loaded {len(file_lines)} songs from {fname} [{pending} pending]")
                     else:
                         _tracked_print(f"{YELLOW}File is empty{RESET}")
@@ -537,20 +625,15 @@ def main():
             if not entry.startswith(("http://", "https://", "www.")):
                 user_query = entry
 
-            q.put({"entry": entry, "user_query": user_query})
-            pending = q.qsize()
+            pipeline.put({"entry": entry, "user_query": user_query})
+            pending = pipeline.pending()
             _tracked_print(f"⏳ Queued: {entry} [{pending} pending]")
 
     except KeyboardInterrupt:
-        if not q.empty():
-            print(f"\n{YELLOW}Finishing current download...{RESET}")
-            while not q.empty():
-                try:
-                    q.get_nowait()
-                    q.task_done()
-                except queue.Empty:
-                    break
-            q.join()
+        if pipeline.pending():
+            print(f"\n{YELLOW}Finishing current downloads...{RESET}")
+            pipeline.drain()
+            pipeline.wait_idle()
 
         print(f"\n{CYAN}Exiting MUSE-CLI. Goodbye!{RESET}")
         sys.exit(0)
@@ -21,8 +21,12 @@ STATUS_ROW = 9
 BANNER_HEIGHT = 10  # total rows the banner occupies (art + separators + status)
 
 
-def print_banner():
-    """Clear screen and draw the banner with a status line between separators."""
+def print_banner(status_rows: int = 1):
+    """Clear screen and draw the banner with status lines between separators.
+
+    With more than one status row (parallel downloads) the extra rows are
+    drawn blank below the prompt text; each worker owns one of them.
+    """
     sys.stdout.write("\033[2J\033[H")
     sys.stdout.flush()
 
@@ -34,4 +38,6 @@ def print_banner():
 
     print(f"{CYAN}{SEPARATOR}{RESET}")          # row 8
     print(f"{WHITE}{PROMPT_TEXT}{RESET}")         # row 9  (STATUS_ROW)
-    print(f"{CYAN}{SEPARATOR}{RESET}")          # row 10
+    for _ in range(status_rows - 1):
+        print()                                   # rows 10.. (extra workers)
+    print(f"{CYAN}{SEPARATOR}{RESET}")          # row 10 + extra rows
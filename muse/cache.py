@@ -0,0 +1,143 @@
+import json
+import time
+
+from .db import Database
+
+# Persistent key/value cache for slow or rate-limited web lookups, stored in
+# ~/.config/muse-cli/cache.db. Each user of the cache gets its own
+# namespace; values are JSON, entries expire after a per-entry TTL and the
+# least recently used entries are evicted once a namespace outgrows its
+# byte budget. Each namespace's size is kept as a running total, updated in
+# the same transaction as every write, so a write never scans the table.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace  TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_lru ON cache(namespace, last_used);
+CREATE TABLE IF NOT EXISTS cache_totals (
+    namespace TEXT PRIMARY KEY,
+    bytes     INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+DAY = 24 * 60 * 60
+
+
+class DiskCache:
+    """One namespace of the shared cache database.
+
+    Usage:
+        cache = DiskCache(path, "musicbrainz", max_bytes=64 << 20)
+        hit, value = cache.get(key)
+        if not hit:
+            value = fetch()
+            cache.set(key, value, ttl=30 * DAY)
+    """
+
+    def __init__(self, path: str, namespace: str, max_bytes: int = 64 << 20):
+        self.db = Database(path, _SCHEMA)
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> tuple[bool, object]:
+        """(True, value) for a fresh entry, (False, None) otherwise."""
+        now = time.time()
+        row = self.db.execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None or row[1] < now:
+            self.misses += 1
+            return False, None
+        try:
+            with self.db.transaction() as conn:
+                conn.execute(
+                    "UPDATE cache SET last_used = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+        except Exception:
+            pass  # a lost LRU touch only affects eviction order
+        self.hits += 1
+        return True, json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float):
+        data = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        try:
+            with self.db.transaction() as conn:
+                total = self._total(conn)
+                old = conn.execute(
+                    "SELECT size FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache "
+                    "(namespace, key, value, size, expires_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.namespace, key, data, len(data), now + ttl, now),
+                )
+                total += len(data) - (old[0] if old else 0)
+                if total > self.max_bytes:
+                    total = self._evict(conn, now, total)
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_totals (namespace, bytes) VALUES (?, ?)",
+                    (self.namespace, total),
+                )
+        except Exception:
+            pass  # caching is best effort
+
+    def _total(self, conn) -> int:
+        row = conn.execute(
+            "SELECT bytes FROM cache_totals WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        if row:
+            return row[0]
+        # Caches written before totals were kept: count once
+        return conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()[0]
+
+    def _evict(self, conn, now: float, total: int) -> int:
+        """Bring the namespace under budget; returns its new size. Only runs
+        once the budget is exceeded, so the expiry scan is rare."""
+        expired = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache WHERE namespace = ? AND expires_at < ?",
+            (self.namespace, now),
+        ).fetchone()[0]
+        if expired:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND expires_at < ?",
+                (self.namespace, now),
+            )
+            total -= expired
+        if total <= self.max_bytes:
+            return total
+        # Drop least recently used entries until we are back under budget
+        victims = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM cache WHERE namespace = ? ORDER BY last_used",
+            (self.namespace,),
+        ):
+            victims.append((self.namespace, key))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?", victims
+        )
+        return total
+
+    def clear(self):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            conn.execute("DELETE FROM cache_totals WHERE namespace = ?", (self.namespace,))
@@ -11,9 +11,20 @@ DEFAULT_CONFIG = {
     "genius_token": "",
     "output_base":  os.path.expanduser("~/Documents/Music"),
     "audio_format": "m4a",
+    "jobs":         1,
+    "engine":       "auto",
+    "cover_size":   1000,
+    "fingerprint":  True,
+    "hash_algorithm": "sha256",
+    "cache_max_mb": 128,
+    "prefetch":     4,
+    "lyrics_concurrency": 3,
+    "metadata_backend": "musicbrainz",
     "first_launch": True
 }
 
+MAX_JOBS = 16
+
 
 def ensure_config_dir():
     os.makedirs(CONFIG_DIR, exist_ok=True)
@@ -62,6 +73,20 @@ def _ask_audio_format() -> str:
             print(f"{RED}Please enter 1 or 2{RESET}")
 
 
+def _ask_jobs(current: int) -> int:
+    """Ask how many songs to download in parallel in interactive mode."""
+    print(f"\n{CYAN}⚡ Parallel Downloads{RESET}")
+    print(f"  {DIM}How many songs the interactive queue downloads at once (1-{MAX_JOBS}){RESET}")
+    while True:
+        choice = input(f"{WHITE}Parallel downloads [{current}]: {RESET}").strip()
+        if not choice:
+            return current
+        if choice.isdigit() and 1 <= int(choice) <= MAX_JOBS:
+            print(f"{GREEN}✓ {choice} parallel download{'s' if int(choice) != 1 else ''}{RESET}")
+            return int(choice)
+        print(f"{RED}Please enter a number between 1 and {MAX_JOBS}{RESET}")
+
+
 def first_launch_setup():
     config = load_config()
 
@@ -152,11 +177,12 @@ def interactive_config():
         print(f"  {CYAN}1.{RESET} Genius API Token: {config['genius_token'][:20] + '...' if config['genius_token'] else 'Not set'}")
         print(f"  {CYAN}2.{RESET} Output Directory: {config['output_base']}")
         print(f"  {CYAN}3.{RESET} Audio Format:     {fmt}")
-        print(f"  {CYAN}4.{RESET} Reset to defaults")
-        print(f"  {CYAN}5.{RESET} Exit")
+        print(f"  {CYAN}4.{RESET} Parallel Downloads: {config.get('jobs', 1)}")
+        print(f"  {CYAN}5.{RESET} Reset to defaults")
+        print(f"  {CYAN}6.{RESET} Exit")
 
         try:
-            choice = input(f"\n{WHITE}Select option (1-5): {RESET}").strip()
+            choice = input(f"\n{WHITE}Select option (1-6): {RESET}").strip()
         except (KeyboardInterrupt, EOFError):
             print()
             return
@@ -180,6 +206,10 @@ def interactive_config():
             save_config(config)
 
         elif choice == "4":
+            config["jobs"] = _ask_jobs(config.get("jobs", 1))
+            save_config(config)
+
+        elif choice == "5":
             confirm = input(f"{YELLOW}Reset all settings to defaults? (y/N): {RESET}").strip().lower()
             if confirm == 'y':
                 config = DEFAULT_CONFIG.copy()
@@ -187,7 +217,7 @@ def interactive_config():
                 save_config(config)
                 print(f"{GREEN}✓ Settings reset to defaults{RESET}")
 
-        elif choice == "5":
+        elif choice == "6":
             return
 
         else:
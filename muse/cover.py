@@ -0,0 +1,141 @@
+import io
+import threading
+from collections import OrderedDict
+
+# Processed cover art is kept in memory, keyed by album when we know it (so
+# every track of an album reuses the same art) and by thumbnail URL
+# otherwise. Nothing touches the disk: the thumbnail is fetched into memory,
+# decoded at reduced size, cropped, encoded once and handed to TagWriter.
+
+DEFAULT_COVER_SIZE = 1000           # px, longest side of the embedded cover
+CACHE_MAX_BYTES = 32 * 1024 * 1024  # total encoded JPEG bytes kept in memory
+
+_YT_MAXRES_URL = "https://i.ytimg.com/vi/{id}/maxresdefault.jpg"
+# Low resolution and letterboxed to 4:3: only when nothing better exists
+_YT_FALLBACK_URL = "https://i.ytimg.com/vi/{id}/hqdefault.jpg"
+
+
+def _fetch(url: str, timeout: int = 15) -> bytes | None:
+    import urllib.request
+    req = urllib.request.Request(url, headers={"User-Agent": "muse-cli"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.read()
+    except Exception:
+        return None
+
+
+def _square_jpeg(data: bytes, target: int) -> bytes | None:
+    """Decode `data` at reduced size, center-crop to a square no larger
+    than `target` px and re-encode as JPEG. Without Pillow, JPEG input is
+    returned unchanged."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return data if data[:3] == b"\xff\xd8\xff" else None
+
+    img = Image.open(io.BytesIO(data))
+    # JPEG: let the decoder scale down by 1/2, 1/4 or 1/8 while decoding
+    img.draft("RGB", (target, target))
+    w, h = img.size
+
+    size = min(w, h)
+    factor = size // target
+    if factor >= 2:
+        # Non-JPEG formats: cheap integer downscale before cropping
+        img = img.reduce(factor)
+        w, h = img.size
+        size = min(w, h)
+
+    left = (w - size) // 2
+    top = (h - size) // 2
+    img = img.crop((left, top, left + size, top + size))
+    if size > target:
+        img = img.resize((target, target), Image.LANCZOS)
+
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+class CoverCache:
+    """Size-bounded LRU of processed covers, safe to share between workers."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES,
+                 target_size: int = DEFAULT_COVER_SIZE):
+        self.max_bytes = max_bytes
+        self.target_size = target_size
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def _put(self, key, data: bytes):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get_cover(self, video_id: str = "", thumbnail_url: str = "",
+                  artist: str = "", album: str = "") -> bytes | None:
+        """Return square JPEG cover bytes, processing the thumbnail only on a
+        cache miss. Returns None when no thumbnail could be fetched."""
+        if album:
+            key = ("album", artist.lower(), album.lower())
+        else:
+            key = ("url", video_id or thumbnail_url)
+        if key == ("url", ""):
+            return None
+
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        # YouTube's JPEG thumbnails decode at reduced size; next comes
+        # whatever thumbnail yt-dlp reported, then the small hqdefault.
+        urls = [_YT_MAXRES_URL.format(id=video_id)] if video_id else []
+        if thumbnail_url:
+            urls.append(thumbnail_url)
+        if video_id:
+            urls.append(_YT_FALLBACK_URL.format(id=video_id))
+        urls = list(dict.fromkeys(urls))
+
+        for url in urls:
+            data = _fetch(url)
+            if not data:
+                continue
+            try:
+                cover = _square_jpeg(data, self.target_size)
+            except Exception:
+                continue
+            if cover:
+                self._put(key, cover)
+                return cover
+        return None
+
+
+_cache = CoverCache()
+
+
+def configure(target_size: int = DEFAULT_COVER_SIZE,
+              max_bytes: int = CACHE_MAX_BYTES):
+    """Replace the shared cover cache (called once at startup from config)."""
+    global _cache
+    _cache = CoverCache(max_bytes=max_bytes, target_size=target_size)
+
+
+def get_cover(video_id: str = "", thumbnail_url: str = "",
+              artist: str = "", album: str = "") -> bytes | None:
+    """Fetch (or reuse) the processed cover from the shared cache."""
+    return _cache.get_cover(video_id, thumbnail_url, artist, album)
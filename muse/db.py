@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Small helper shared by the SQLite stores under ~/.config/muse-cli.
+#
+# Every thread gets its own connection (sqlite3 connections must not be
+# shared between threads), the database runs in WAL mode so readers never
+# block the writer, and writes go through BEGIN IMMEDIATE so two workers —
+# or two muse-cli processes — serialize cleanly instead of failing with
+# "database is locked" halfway through a transaction.
+
+BUSY_TIMEOUT = 30  # seconds to wait for another writer
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class Database:
+    """Per-thread connections to one SQLite file.
+
+    Usage:
+        db = Database(path, schema="CREATE TABLE IF NOT EXISTS ...")
+        rows = db.execute("SELECT ...", params).fetchall()
+        with db.transaction() as conn:
+            conn.execute("INSERT ...")
+    """
+
+    def __init__(self, path: str, schema: str = ""):
+        self.path = path
+        self._local = threading.local()
+        if schema:
+            with self.transaction() as conn:
+                for statement in schema.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    def execute(self, sql: str, params=()):
+        return self.conn.execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; commits on success, rolls back on error."""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
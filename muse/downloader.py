@@ -1,12 +1,13 @@
 import os
 import subprocess
 import re
-import glob as glob_mod
-from concurrent.futures import ThreadPoolExecutor
-from mutagen.easyid3 import EasyID3
-from mutagen.mp4 import MP4
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from .colors import CYAN, GREEN, YELLOW, RED, DIM, RESET
+from .engine import get_engine
+from .tagging import TagWriter
+from .cover import get_cover
 
 BAR_LENGTH = 40
 
@@ -50,6 +51,41 @@ def _split_title(raw_title: str) -> tuple[str, str] | None:
     return None
 
 
+_VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+_YOUTUBE_HOSTS = {
+    "youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+    "youtube-nocookie.com", "www.youtube-nocookie.com",
+}
+
+# Path prefixes that are followed directly by the video ID
+_ID_PATH_PREFIXES = ("shorts", "embed", "v", "live", "e")
+
+
+def video_id_from_url(url: str) -> str | None:
+    """Parse the video ID out of a YouTube / YouTube Music / youtu.be URL
+    without any network call. Returns None for anything it doesn't know."""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    host = (parts.hostname or "").lower()
+    path = [p for p in parts.path.split("/") if p]
+
+    candidate = None
+    if host in ("youtu.be", "www.youtu.be"):
+        candidate = path[0] if path else None
+    elif host in _YOUTUBE_HOSTS:
+        if path and path[0] == "watch":
+            candidate = (parse_qs(parts.query).get("v") or [None])[0]
+        elif len(path) >= 2 and path[0] in _ID_PATH_PREFIXES:
+            candidate = path[1]
+
+    if candidate and _VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
+
+
 def _clean_channel_name(name: str) -> str:
     suffixes = [r'\s*-\s*Topic$', r'\s*VEVO$', r'\s*Official\s*$', r'\s*Music\s*$']
     for s in suffixes:
@@ -57,29 +93,40 @@ def _clean_channel_name(name: str) -> str:
     return name.strip()
 
 
+def _is_topic_upload(info: dict) -> bool:
+    return any(re.search(r'\s-\sTopic$', info.get(f) or "", flags=re.IGNORECASE)
+               for f in ("uploader", "channel"))
+
+
+def has_video_info(info: dict | None) -> bool:
+    """True when a pre-resolved info record has enough fields to skip
+    `extract_video_info`: a video id and a title, plus the artist and
+    thumbnail fields (which may be empty, but must have been looked at;
+    flat search results leave them out).
+
+    Search results from "- Topic" channels don't carry the YouTube Music
+    fields (track, album, year); fetching them costs one YouTube request
+    and usually saves the slower MusicBrainz lookup."""
+    if not (info and info.get("id") and info.get("title")):
+        return False
+    if "artist" not in info or "thumbnail" not in info:
+        return False
+    return "track" in info or not _is_topic_upload(info)
+
+
 def extract_video_info(url: str) -> tuple[str, str, str, bool]:
     """Returns (artist, title, video_id, is_cover)."""
-    info_cmd = [
-        "yt-dlp", "--no-playlist", "--quiet",
-        "--print", "%(artist)s\n%(title)s\n%(uploader)s\n%(channel)s\n%(id)s",
-        "--add-header", "Accept-Language:en-US,en;q=0.9",
-        "--extractor-args", "youtube:lang=en",
-        url
-    ]
-    try:
-        result = subprocess.run(
-            info_cmd, capture_output=True, text=True, check=True, timeout=30
-        )
-    except subprocess.TimeoutExpired:
-        raise Exception("[E01] Timeout fetching video info — check your connection")
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"[E02] yt-dlp failed: {e.stderr.strip()}")
+    return parse_video_info(get_engine().extract_info(url))
 
-    lines = [l.strip() for l in result.stdout.strip().split("\n")]
-    while len(lines) < 5:
-        lines.append("")
 
-    raw_artist, raw_title, raw_uploader, raw_channel, video_id = lines[:5]
+def parse_video_info(info: dict) -> tuple[str, str, str, bool]:
+    """Turn a yt-dlp style info record (artist, title, uploader, channel, id)
+    into (artist, title, video_id, is_cover)."""
+    raw_artist   = info.get("artist") or ""
+    raw_title    = info.get("title") or ""
+    raw_uploader = info.get("uploader") or ""
+    raw_channel  = info.get("channel") or ""
+    video_id     = info.get("id") or ""
 
     # Check for cover on raw title BEFORE stripping noise
     is_cover = bool(re.search(r'\bcover\b', raw_title, flags=re.IGNORECASE))
@@ -97,53 +144,33 @@ def extract_video_info(url: str) -> tuple[str, str, str, bool]:
 
 
 def download_with_progress(url: str, output_template: str, audio_format: str,
-                           on_progress=None) -> str:
-    download_cmd = [
-        "yt-dlp", "--no-playlist",
-        "--extract-audio",
-        "--audio-format", audio_format,
-        "--audio-quality", "0",
-        "--embed-thumbnail",
-        "--write-thumbnail",
-        "--add-metadata",
-        "--newline", "--progress",
-        "--progress-template", "download:%(progress.percentage)s",
-        "--add-header", "Accept-Language:en-US,en;q=0.9",
-        "--extractor-args", "youtube:lang=en",
-        "-o", output_template,
-        url
-    ]
+                           on_progress=None, details: dict | None = None) -> str:
+    last_percent = -1
+
+    def _on_percent(percent):
+        nonlocal last_percent
+        if abs(percent - last_percent) < 1:
+            return
+        if on_progress:
+            on_progress("downloading", f"{int(percent)}%")
+        else:
+            filled = int((percent / 100) * BAR_LENGTH)
+            bar = (
+                f"{CYAN}[{'█' * filled}{'▒' * (BAR_LENGTH - filled)}]{RESET}"
+                f" {CYAN}{int(percent)}%{RESET}"
+            )
+            print(f"\r   {bar}", end="", flush=True)
+        last_percent = percent
+
     try:
-        proc = subprocess.Popen(
-            download_cmd, stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT, text=True, bufsize=1
+        final_path = get_engine().download(
+            url, output_template, audio_format, on_percent=_on_percent,
+            details=details
         )
-        last_percent = -1
-        for line in proc.stdout:
-            line = line.strip()
-            try:
-                if line and not line.startswith('['):
-                    m = re.search(r'(\d+\.?\d*)%', line)
-                    if m:
-                        percent = float(m.group(1))
-                        if abs(percent - last_percent) >= 1:
-                            if on_progress:
-                                on_progress("downloading", f"{int(percent)}%")
-                            else:
-                                filled = int((percent / 100) * BAR_LENGTH)
-                                bar = (
-                                    f"{CYAN}[{'█' * filled}{'▒' * (BAR_LENGTH - filled)}]{RESET}"
-                                    f" {CYAN}{int(percent)}%{RESET}"
-                                )
-                                print(f"\r   {bar}", end="", flush=True)
-                            last_percent = percent
-            except Exception:
-                continue
         if not on_progress:
             print()
-        proc.wait()
-        if proc.returncode != 0:
-            raise Exception(f"[E03] yt-dlp exited with code {proc.returncode}")
+        if final_path and os.path.exists(final_path):
+            return final_path
         return find_latest_audio(os.path.dirname(output_template), audio_format)
     except Exception as e:
         raise Exception(f"[E03] Download failed: {e}")
@@ -164,33 +191,6 @@ def find_latest_audio(artist_dir: str, audio_format: str) -> str:
     return max(audio_files, key=lambda x: x[1])[0]
 
 
-def _write_tags(filepath: str, title: str, artist: str, album: str,
-                year: str, audio_format: str):
-    try:
-        if audio_format == "mp3":
-            audio = EasyID3(filepath)
-            audio["title"]  = [title]
-            audio["artist"] = [artist]
-            audio["genre"]  = ["Music"]
-            if album:
-                audio["album"] = [album]
-            if year:
-                audio["date"] = [year]
-            audio.save()
-        else:
-            audio = MP4(filepath)
-            audio["\xa9nam"] = [title]
-            audio["\xa9ART"] = [artist]
-            audio["\xa9gen"] = ["Music"]
-            if album:
-                audio["\xa9alb"] = [album]
-            if year:
-                audio["\xa9day"] = [year]
-            audio.save()
-    except Exception as e:
-        print(f"{YELLOW}⚠  Could not write tags: {e}{RESET}")
-
-
 def _add_to_apple_music(filepath: str):
     import platform
     if platform.system() != "Darwin":
@@ -204,236 +204,341 @@ def _add_to_apple_music(filepath: str):
         pass
 
 
-def _squarify_thumbnail(audio_path: str, artist_dir: str, audio_format: str):
-    """Find the thumbnail file, center-crop to square, re-embed into audio."""
-    try:
-        from PIL import Image
-        import io
-    except ImportError:
-        return  # Pillow not installed, skip silently
-
-    # Find thumbnail file written by yt-dlp that matches this audio file's basename
-    thumb_path = None
-    audio_basename = os.path.splitext(os.path.basename(audio_path))[0]
-    exts = ['.webp', '.jpg', '.jpeg', '.png']
-    candidates = []
-    for ext in exts:
-        # exact basename match (e.g. basename.jpg)
-        candidates.extend(glob_mod.glob(os.path.join(artist_dir, f"{audio_basename}{ext}")))
-        # prefixed variants (e.g. basename_1280x720.jpg or basename_extra.jpg)
-        candidates.extend(glob_mod.glob(os.path.join(artist_dir, f"{audio_basename}_*{ext}")))
-
-    if candidates:
-        # Pick the most recently created one
-        thumb_path = max(candidates, key=os.path.getctime)
-
-    if not thumb_path:
-        return
-
-    try:
-        img = Image.open(thumb_path)
-        w, h = img.size
-        if w == h:
-            # Already square, clean up and return
-            os.remove(thumb_path)
-            return
-
-        # Center-crop to square
-        size = min(w, h)
-        left = (w - size) // 2
-        top = (h - size) // 2
-        img = img.crop((left, top, left + size, top + size))
-
-        # Convert to JPEG bytes
-        buf = io.BytesIO()
-        img.convert("RGB").save(buf, format="JPEG", quality=92)
-        cover_data = buf.getvalue()
-
-        # Re-embed using mutagen
-        if audio_format == "mp3":
-            from mutagen.id3 import ID3, APIC
-            id3 = ID3(audio_path)
-            # Remove existing cover art
-            id3.delall("APIC")
-            id3.add(APIC(
-                encoding=3, mime="image/jpeg", type=3,
-                desc="Cover", data=cover_data
-            ))
-            id3.save()
-        else:
-            audio = MP4(audio_path)
-            from mutagen.mp4 import MP4Cover
-            audio["covr"] = [MP4Cover(cover_data, imageformat=MP4Cover.FORMAT_JPEG)]
-            audio.save()
-
-    except Exception as e:
-        print(f"{YELLOW}⚠  Could not squarify thumbnail: {e}{RESET}")
-    finally:
-        # Clean up thumbnail file
-        try:
-            if thumb_path and os.path.exists(thumb_path):
-                os.remove(thumb_path)
-        except Exception:
-            pass
-
-
 def _sanitize_path_component(name: str) -> str:
     return re.sub(r'[\/\\\:\*\?\"\<\>\|]', '', name).strip() or "Unknown"
 
 
-def download_song(url: str, output_base: str, duplicate_checker, lyrics_manager,
-                  user_query: str = "", audio_format: str = "m4a",
-                  batch_mode: bool = False, on_progress=None):
-    """Download a song. When on_progress is set, use compact single-line output."""
+# ── Song stages ───────────────────────────────────────────────────────────────
+#
+# A download is split into four stages that share a `job` dict. Each stage
+# returns True when the job should move on to the next one, or False when it
+# has been finished early (duplicate, no metadata dir, ...). `download_song`
+# runs them back to back; `pipeline.Pipeline` runs each one on its own worker
+# pool so consecutive songs overlap.
+
+def new_job(url: str, output_base: str, user_query: str = "",
+            audio_format: str = "m4a", batch_mode: bool = False,
+            info: dict | None = None) -> dict:
+    """Create the shared state passed between song stages.
+
+    `info` is an optional pre-resolved info record (e.g. a search result's
+    "info"); when it is complete the resolve stage skips the yt-dlp lookup.
+    Prefetched "mb" (MusicBrainz match) and "lyrics" ((song, status) from
+    `fetch_lyrics`) entries may be added to the job the same way, as values
+    or as Futures of lookups that are still running.
+    """
+    return {
+        "info":         info,
+        "url":          url,
+        "output_base":  output_base,
+        "user_query":   user_query,
+        "audio_format": audio_format,
+        "batch_mode":   batch_mode,
+    }
+
+
+def _confirm_new_id(job: dict, video_id: str, label: str | None,
+                    duplicate_checker, on_progress=None) -> bool:
+    """Check `video_id` against the library. Returns True when the song
+    should be downloaded (new, or the user chose to overwrite).
+
+    `label` names the song in the skip message; None uses the existing
+    file's name.
+    """
+    is_dup, existing_file = duplicate_checker.is_duplicate_by_id(video_id)
+    if not is_dup:
+        return True
+    if label is None:
+        label = os.path.splitext(os.path.basename(existing_file))[0]
+    if on_progress:
+        on_progress("skip", f"{label} · already in library")
+        return False
+    print(f"{YELLOW}⚠  Already in library: {existing_file}{RESET}")
+    if job["batch_mode"]:
+        print(f"{DIM}   Skipped (batch mode).{RESET}")
+        return False
     try:
-        if not url.startswith(("http://", "https://")):
-            if on_progress:
-                on_progress("error", "Invalid URL")
-            else:
-                print(f"{RED}❌ Invalid URL{RESET}")
-            return
+        choice = input(f"{YELLOW}   Overwrite? (y/N): {RESET}").strip().lower()
+    except (KeyboardInterrupt, EOFError):
+        print()
+        return False
+    if choice != 'y':
+        print(f"{DIM}   Skipped.{RESET}")
+        return False
+    try:
+        os.remove(existing_file)
+    except Exception:
+        pass
+    duplicate_checker.remove_entries(video_id, existing_file)
+    return True
 
-        # ── Fetch video info ─────────────────────────────────────────────────
-        if on_progress:
-            on_progress("searching", "fetching info...")
-        else:
-            print(f"{DIM}   Fetching info...{RESET}", end="\r")
-        artist, title, video_id, is_cover = extract_video_info(url)
 
+def resolve_stage(job: dict, duplicate_checker, on_progress=None) -> bool:
+    """Fetch video info and reject known video IDs."""
+    url = job["url"]
+    if not url.startswith(("http://", "https://")):
         if on_progress:
-            on_progress("found", f"{artist} — {title}")
+            on_progress("error", "Invalid URL")
         else:
-            print(f"   {GREEN}▶ {artist} — {title}{RESET}          ")
-
-        # ── Duplicate check ──────────────────────────────────────────────────
-        is_dup, existing_file = duplicate_checker.is_duplicate_by_id(video_id)
-        if is_dup:
-            if on_progress:
-                on_progress("skip", f"{artist} — {title} · already in library")
-                return
-            print(f"{YELLOW}⚠  Already in library: {existing_file}{RESET}")
-            if batch_mode:
-                print(f"{DIM}   Skipped (batch mode).{RESET}")
-                return
-            try:
-                choice = input(f"{YELLOW}   Overwrite? (y/N): {RESET}").strip().lower()
-            except (KeyboardInterrupt, EOFError):
-                print()
-                return
-            if choice != 'y':
-                print(f"{DIM}   Skipped.{RESET}")
-                return
-            try:
-                os.remove(existing_file)
-            except Exception:
-                pass
-            duplicate_checker.remove_entries(video_id, existing_file)
-
-        # ── MusicBrainz metadata lookup ──────────────────────────────────────
+            print(f"{RED}❌ Invalid URL{RESET}")
+        return False
+
+    # Known URLs are rejected before any network call
+    url_id = video_id_from_url(url)
+    if url_id and not _confirm_new_id(job, url_id, None,
+                                      duplicate_checker, on_progress):
+        return False
+
+    if not has_video_info(job.get("info")):
         if on_progress:
-            on_progress("metadata", f"{artist} — {title} · fetching metadata...")
+            on_progress("searching", "fetching info...")
         else:
-            print(f"{DIM}   Looking up metadata...{RESET}", end="\r")
+            print(f"{DIM}   Fetching info...{RESET}", end="\r")
+        job["info"] = get_engine().extract_info(url)
+    artist, title, video_id, is_cover = parse_video_info(job["info"])
+    job.update(artist=artist, title=title, video_id=video_id, is_cover=is_cover)
+
+    if on_progress:
+        on_progress("found", f"{artist} — {title}")
+    else:
+        print(f"   {GREEN}▶ {artist} — {title}{RESET}          ")
+
+    if video_id == url_id:
+        return True
+    return _confirm_new_id(job, video_id, f"{artist} — {title}",
+                           duplicate_checker, on_progress)
+
+
+def apply_prefetched(job: dict, prefetched: dict | None):
+    for key in ("mb", "lyrics"):
+        if prefetched and prefetched.get(key) is not None:
+            job[key] = prefetched[key]
+
+
+def _prefetched(value):
+    """A prefetched "mb"/"lyrics" entry: a value, or a Future of a Prefetcher
+    lookup that may still be running (None when it failed)."""
+    if isinstance(value, Future):
+        return value.result()
+    return value
+
+
+def _fetch_lyrics(job: dict, lyrics_manager, title: str, artist: str):
+    song = _prefetched(job.get("lyrics"))
+    if song is not None:
+        return song
+    return lyrics_manager.fetch_lyrics(
+        title, artist, user_query=job["user_query"], is_cover=job["is_cover"]
+    )
+
+
+def metadata_stage(job: dict, lyrics_manager, lyrics_executor,
+                   on_progress=None) -> bool:
+    """Look up MusicBrainz metadata, prepare the output path and start the
+    lyrics and cover fetches on `lyrics_executor` so they run while the
+    song downloads."""
+    artist, title = job["artist"], job["title"]
+    if on_progress:
+        on_progress("metadata", f"{artist} — {title} · fetching metadata...")
+    else:
+        print(f"{DIM}   Looking up metadata...{RESET}", end="\r")
+    mb = _prefetched(job.get("mb"))
+    if mb is None:
         from .metadata import lookup_metadata
-        mb = lookup_metadata(artist, title, is_cover=is_cover)
-
-        # Use MusicBrainz data if found, fall back to YouTube data
-        final_artist = mb.get('artist') or artist
-        final_title  = mb.get('title')  or title
-        album        = mb.get('album')  or ""
-        year         = mb.get('year')   or ""
-
+        mb = lookup_metadata(artist, title, is_cover=job["is_cover"],
+                             info=job["info"])
+
+    # Use MusicBrainz data if found, fall back to YouTube data
+    final_artist = mb.get('artist') or artist
+    final_title  = mb.get('title')  or title
+    album        = mb.get('album')  or ""
+    year         = mb.get('year')   or ""
+
+    if on_progress:
+        on_progress("metadata", f"{final_artist} — {final_title} · metadata ✓")
+    elif mb:
+        print(f"{DIM}   Metadata: {final_artist} — {final_title}"
+              f"{(' / ' + album) if album else ''}"
+              f"{(' (' + year + ')') if year else ''}{RESET}          ")
+    else:
+        print(f"   {DIM}Metadata not found on MusicBrainz{RESET}          ")
+
+    safe_artist = _sanitize_path_component(final_artist)
+    safe_title  = _sanitize_path_component(final_title)
+    safe_album  = _sanitize_path_component(album) if album else "Unknown Album"
+
+    artist_dir = os.path.join(job["output_base"], safe_artist, safe_album)
+    os.makedirs(artist_dir, exist_ok=True)
+
+    # Waits for prefetched lyrics still in flight, or looks them up
+    lyrics_future = lyrics_executor.submit(
+        _fetch_lyrics, job, lyrics_manager, final_title, final_artist
+    )
+
+    job.update(
+        final_artist=final_artist, final_title=final_title,
+        album=album, year=year,
+        artist_dir=artist_dir, safe_title=safe_title,
+        lyrics_future=lyrics_future,
+        cover_future=lyrics_executor.submit(
+            get_cover,
+            video_id=video_id_from_url(job["url"]) or "",
+            thumbnail_url=job["info"].get("thumbnail") or "",
+            artist=final_artist, album=album,
+        ),
+    )
+    return True
+
+
+def download_stage(job: dict, on_progress=None) -> bool:
+    """Download the audio into the album folder under its final name."""
+    final_artist, final_title = job["final_artist"], job["final_title"]
+    artist_dir, audio_format = job["artist_dir"], job["audio_format"]
+    output_template = os.path.join(artist_dir, f"{job['safe_title']}.%(ext)s")
+
+    if on_progress:
+        on_progress("downloading", f"{final_artist} — {final_title} · downloading 0%")
+    else:
+        print(f"{DIM}   Downloading...{RESET}")
+
+    def _dl_progress(stage, detail):
+        on_progress(stage, f"{final_artist} — {final_title} · downloading {detail}")
+
+    details = {}
+    downloaded_file = download_with_progress(
+        job["url"], output_template, audio_format,
+        on_progress=_dl_progress if on_progress else None, details=details
+    )
+    job["source_url"] = details.get("webpage_url") or job["url"]
+    job["description"] = details.get("description") or ""
+
+    desired_path = os.path.join(artist_dir, f"{job['safe_title']}.{audio_format}")
+    if downloaded_file != desired_path and os.path.exists(downloaded_file):
+        os.replace(downloaded_file, desired_path)
+        downloaded_file = desired_path
+
+    job["downloaded_file"] = downloaded_file
+    return True
+
+
+def hash_stage(job: dict, duplicate_checker) -> bool:
+    """Hash the untagged audio payload once; the same hash is used for the
+    content duplicate check and for registration after tagging. The acoustic
+    fingerprint is computed alongside it."""
+    job["content_hash"] = duplicate_checker.compute_audio_hash(job["downloaded_file"])
+    job["fingerprint"] = duplicate_checker.compute_fingerprint(job["downloaded_file"])
+    return True
+
+
+def finalize_stage(job: dict, duplicate_checker, on_progress=None) -> bool:
+    """Content duplicate check, cover, lyrics, tags and registration."""
+    final_artist, final_title = job["final_artist"], job["final_title"]
+    album, year = job["album"], job["year"]
+    audio_format = job["audio_format"]
+    downloaded_file = job["downloaded_file"]
+
+    # ── Content duplicate check ──────────────────────────────────────────────
+    content_hash = job.get("content_hash")
+    if content_hash is None:
+        content_hash = duplicate_checker.compute_audio_hash(downloaded_file)
+    is_dup, existing_file = duplicate_checker.is_duplicate(downloaded_file, content_hash)
+    if is_dup:
         if on_progress:
-            on_progress("metadata", f"{final_artist} — {final_title} · metadata ✓")
-        elif mb:
-            print(f"{DIM}   Metadata: {final_artist} — {final_title}"
-                  f"{(' / ' + album) if album else ''}"
-                  f"{(' (' + year + ')') if year else ''}{RESET}          ")
+            on_progress("skip", f"{final_artist} — {final_title} · duplicate content")
         else:
-            print(f"   {DIM}Metadata not found on MusicBrainz{RESET}          ")
-
-        # ── Prepare output path ──────────────────────────────────────────────
-        safe_artist = _sanitize_path_component(final_artist)
-        safe_title  = _sanitize_path_component(final_title)
-        safe_album  = _sanitize_path_component(album) if album else "Unknown Album"
-
-        artist_dir = os.path.join(output_base, safe_artist, safe_album)
-        os.makedirs(artist_dir, exist_ok=True)
-        output_template = os.path.join(artist_dir, f"{safe_title}.%(ext)s")
-
-        # ── Start lyrics fetch in background, download in foreground ─────────
+            print(f"{YELLOW}⚠  Duplicate content, removing...{RESET}")
+        try:
+            os.remove(downloaded_file)
+        except Exception:
+            pass
+        return False
+
+    # ── Same recording from another upload ───────────────────────────────────
+    fp = job.get("fingerprint")
+    if fp is None:
+        fp = duplicate_checker.compute_fingerprint(downloaded_file)
+    is_dup, existing_file = duplicate_checker.is_near_duplicate(fp)
+    if is_dup:
+        name = os.path.basename(existing_file)
         if on_progress:
-            on_progress("downloading", f"{final_artist} — {final_title} · downloading 0%")
+            on_progress("skip", f"{final_artist} — {final_title} · same recording as {name}")
         else:
-            print(f"{DIM}   Downloading...{RESET}")
-
-        def _dl_progress(stage, detail):
-            on_progress(stage, f"{final_artist} — {final_title} · downloading {detail}")
+            print(f"{YELLOW}⚠  Same recording already in library ({name}), removing...{RESET}")
+        try:
+            os.remove(downloaded_file)
+        except Exception:
+            pass
+        return False
 
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            lyrics_future = executor.submit(
-                lyrics_manager.fetch_lyrics,
-                final_title, final_artist,
-                user_query=user_query, is_cover=is_cover
-            )
+    # Cover, lyrics, text and source tags are collected first and written in one save
+    tags = TagWriter(downloaded_file, audio_format)
+    tags.set_text(final_title, final_artist, album, year)
+    tags.set_source(job.get("source_url") or job["url"], job.get("description", ""))
 
-            downloaded_file = download_with_progress(
-                url, output_template, audio_format,
-                on_progress=_dl_progress if on_progress else None
-            )
+    # ── Cover art (from background fetch / album cache) ──────────────────────
+    cover = job["cover_future"].result()
+    if cover:
+        tags.set_cover(cover)
 
-        desired_path = os.path.join(artist_dir, f"{safe_title}.{audio_format}")
-        if downloaded_file != desired_path and os.path.exists(downloaded_file):
-            os.replace(downloaded_file, desired_path)
-            downloaded_file = desired_path
-
-        # ── Content duplicate check ──────────────────────────────────────────
-        is_dup, existing_file = duplicate_checker.is_duplicate(downloaded_file)
-        if is_dup:
-            if on_progress:
-                on_progress("skip", f"{final_artist} — {final_title} · duplicate content")
-            else:
-                print(f"{YELLOW}⚠  Duplicate content, removing...{RESET}")
-            try:
-                os.remove(downloaded_file)
-            except Exception:
-                pass
-            return
+    # ── Lyrics (from background fetch) ───────────────────────────────────────
+    if on_progress:
+        on_progress("lyrics", f"{final_artist} — {final_title} · lyrics...")
+    song, lyrics_status = job["lyrics_future"].result()
+    if song:
+        tags.set_lyrics(song.lyrics)
 
-        # ── Squarify thumbnail ───────────────────────────────────────────────
-        _squarify_thumbnail(downloaded_file, artist_dir, audio_format)
+    lyrics_ok = "✓" if song else "✗"
 
-        # ── Embed lyrics (from background fetch) ─────────────────────────────
-        if on_progress:
-            on_progress("lyrics", f"{final_artist} — {final_title} · lyrics...")
-        song, lyrics_status = lyrics_future.result()
+    # ── Write tags ───────────────────────────────────────────────────────────
+    try:
+        tags.save()
+    except Exception as e:
+        print(f"{YELLOW}⚠  Could not write tags: {e}{RESET}")
         if song:
-            result = lyrics_manager.embed_lyrics(downloaded_file, song, audio_format)
-        else:
-            from .lyrics import LyricsResult
-            result = LyricsResult(lyrics_status)
+            lyrics_status = f"{YELLOW}⚠  Lyrics found but embed failed: {e}{RESET}"
+
+    # ── Register + Apple Music ────────────────────────────────────────────────
+    duplicate_checker.register(job["video_id"], content_hash, downloaded_file)
+    duplicate_checker.register_fingerprint(fp, downloaded_file)
+    _add_to_apple_music(downloaded_file)
+
+    # ── Summary ──────────────────────────────────────────────────────────────
+    if on_progress:
+        album_info = f" · {album}" if album else ""
+        year_info = f" ({year})" if year else ""
+        on_progress("done", f"{final_artist} — {final_title}{album_info}{year_info} · lyrics {lyrics_ok}")
+    else:
+        print(f"{GREEN}✅ {final_artist} — {final_title}{RESET}")
+        if album:
+            print(f"{DIM}   Album: {album}{(' (' + year + ')') if year else ''}{RESET}")
+        print(lyrics_status)
+    return True
 
-        lyrics_ok = "✓" if song else "✗"
 
-        # ── Write tags ───────────────────────────────────────────────────────
-        _write_tags(downloaded_file, final_title, final_artist,
-                    album, year, audio_format)
+def download_song(url: str, output_base: str, duplicate_checker, lyrics_manager,
+                  user_query: str = "", audio_format: str = "m4a",
+                  batch_mode: bool = False, on_progress=None, info=None,
+                  prefetched: dict | None = None):
+    """Download a song. When on_progress is set, use compact single-line output.
+
+    Pass `info` (a search result's "info" record) to skip the second yt-dlp
+    info extraction for songs that were found through search, and
+    `prefetched` (from `Prefetcher.take`) to reuse metadata and lyrics that
+    were looked up while earlier songs downloaded.
+    """
+    job = new_job(url, output_base, user_query=user_query,
+                  audio_format=audio_format, batch_mode=batch_mode, info=info)
+    apply_prefetched(job, prefetched)
+    try:
+        if not resolve_stage(job, duplicate_checker, on_progress):
+            return
 
-        # ── Register + Apple Music ────────────────────────────────────────────
-        file_hash = duplicate_checker.compute_file_hash(downloaded_file)
-        duplicate_checker.register(video_id, file_hash, downloaded_file)
-        _add_to_apple_music(downloaded_file)
+        # Lyrics and cover are fetched in the background while the song downloads
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            metadata_stage(job, lyrics_manager, executor, on_progress)
+            download_stage(job, on_progress)
 
-        # ── Summary ──────────────────────────────────────────────────────────
-        if on_progress:
-            album_info = f" · {album}" if album else ""
-            year_info = f" ({year})" if year else ""
-            on_progress("done", f"{final_artist} — {final_title}{album_info}{year_info} · lyrics {lyrics_ok}")
-        else:
-            print(f"{GREEN}✅ {final_artist} — {final_title}{RESET}")
-            if album:
-                print(f"{DIM}   Album: {album}{(' (' + year + ')') if year else ''}{RESET}")
-            print(result.status)
+        finalize_stage(job, duplicate_checker, on_progress)
 
     except KeyboardInterrupt:
         raise
@@ -442,4 +547,4 @@ def download_song(url: str, output_base: str, duplicate_checker, lyrics_manager,
             on_progress("error", str(e))
         else:
             print(f"{RED}❌ {e}{RESET}")
-            print(f"{DIM}   See github.com/Ulasti/muse-cli for error codes{RESET}")
\ No newline at end of file
+            print(f"{DIM}   See github.com/Ulasti/muse-cli for error codes{RESET}")
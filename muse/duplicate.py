@@ -1,110 +1,407 @@
 import os
 import hashlib
 import shutil
+import struct
+from functools import partial
 
+from . import fingerprint
+from .db import Database
 from .colors import GREEN, YELLOW, CYAN, RED, RESET
 
 
+# ── Audio payload location ───────────────────────────────────────────────────
+#
+# Content hashes cover only the audio stream, never the tags, so the hash of
+# a fresh download matches the stored hash of an already tagged copy.
+
+def _mp4_payload_spans(f, file_size: int) -> list[tuple[int, int]]:
+    """(offset, length) of every top-level `mdat` box payload."""
+    spans = []
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_len = 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_len = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_len:
+            break
+        if box_type == b"mdat":
+            spans.append((pos + header_len, min(size, file_size - pos) - header_len))
+        pos += size
+    return spans
+
+
+def _mp3_payload_spans(f, file_size: int) -> list[tuple[int, int]]:
+    """The span between a leading ID3v2 tag and trailing APEv2/ID3v1 tags."""
+    start, end = 0, file_size
+
+    f.seek(0)
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b"ID3":
+        size = 0
+        for b in header[6:10]:
+            size = (size << 7) | (b & 0x7F)   # syncsafe integer
+        start = 10 + size + (10 if header[5] & 0x10 else 0)
+
+    if end - start >= 128:
+        f.seek(end - 128)
+        if f.read(3) == b"TAG":
+            end -= 128
+    if end - start >= 32:
+        f.seek(end - 32)
+        footer = f.read(32)
+        if footer[:8] == b"APETAGEX":
+            ape_size = struct.unpack("<I", footer[12:16])[0]
+            has_header = struct.unpack("<I", footer[20:24])[0] & 0x80000000
+            end -= ape_size + (32 if has_header else 0)
+
+    return [(start, max(0, end - start))]
+
+
+def audio_payload_spans(filepath: str) -> list[tuple[int, int]]:
+    """Byte ranges holding the audio stream of an m4a/mp3 file, excluding
+    metadata. Other files are treated as all payload."""
+    file_size = os.path.getsize(filepath)
+    ext = os.path.splitext(filepath)[1].lower()
+    with open(filepath, "rb") as f:
+        if ext in (".m4a", ".mp4", ".aac", ".alac"):
+            spans = _mp4_payload_spans(f, file_size)
+            if spans:
+                return spans
+        elif ext == ".mp3":
+            return _mp3_payload_spans(f, file_size)
+    return [(0, file_size)]
+
+
+def audio_payload_size(filepath: str) -> int:
+    """Length of the audio payload; equal audio always has equal length, so
+    only files whose lengths collide ever need hashing."""
+    return sum(length for _, length in audio_payload_spans(filepath))
+
+
+HASH_ALGORITHMS = ("sha256", "blake2b", "blake3")
+# What registered content hashes cover, stored in the `meta` table. The old
+# text databases held whole-file digests of tagged files, which can never
+# match an audio payload hash.
+HASH_FORMAT = "audio-payload"
+READ_BUFFER = 1 << 20  # one large read per MiB instead of 8 KiB chunks
+
+
+def resolve_hash_algorithm(name: str) -> str:
+    """Validate the `hash_algorithm` setting. blake3 needs the optional
+    `blake3` package and falls back to blake2b without it."""
+    if name not in HASH_ALGORITHMS:
+        print(f"{YELLOW}⚠️  Unknown hash_algorithm '{name}', using sha256{RESET}")
+        return "sha256"
+    if name == "blake3":
+        try:
+            import blake3  # noqa: F401
+        except ImportError:
+            return "blake2b"
+    return name
+
+
+def _new_hasher(algorithm: str):
+    if algorithm == "blake3":
+        import blake3
+        return blake3.blake3()
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=32)
+    return hashlib.sha256()
+
+
+def audio_hash(filepath: str, algorithm: str = "sha256",
+               chunk_size: int = READ_BUFFER) -> str:
+    """Digest of the audio payload only (tags excluded). Reads into one
+    reused buffer, so hashing is bound by the disk, not by allocations.
+    Raises on I/O errors; safe to run in a worker process."""
+    hasher = _new_hasher(algorithm)
+    buf = memoryview(bytearray(chunk_size))
+    with open(filepath, "rb", buffering=0) as f:
+        for offset, length in audio_payload_spans(filepath):
+            f.seek(offset)
+            while length > 0:
+                n = f.readinto(buf[:min(chunk_size, length)])
+                if not n:
+                    break
+                hasher.update(buf[:n])
+                length -= n
+    return hasher.hexdigest()
+
+
+def _try_audio_hash(filepath: str, algorithm: str = "sha256") -> str | None:
+    try:
+        return audio_hash(filepath, algorithm)
+    except Exception:
+        return None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind     TEXT NOT NULL,
+    key      TEXT NOT NULL,
+    filepath TEXT NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_by_path ON entries(filepath);
+CREATE TABLE IF NOT EXISTS sizes (
+    filepath TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sizes_by_size ON sizes(size);
+CREATE TABLE IF NOT EXISTS hash_cache (
+    dev       INTEGER NOT NULL,
+    ino       INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    algorithm TEXT NOT NULL,
+    hash      TEXT NOT NULL,
+    PRIMARY KEY (dev, ino)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+_CACHE_UPSERT = """
+INSERT OR REPLACE INTO hash_cache (dev, ino, size, mtime_ns, algorithm, hash)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def _cache_row(st: os.stat_result, algorithm: str, file_hash: str) -> tuple:
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algorithm, file_hash)
+
+_UPSERT = """
+INSERT INTO entries (kind, key, filepath) VALUES (?, ?, ?)
+ON CONFLICT (kind, key) DO UPDATE SET filepath = excluded.filepath
+"""
+
+
 class DuplicateChecker:
-    def __init__(self, config_dir, output_base=None):
+    """Known downloads, keyed by YouTube video ID and audio content hash.
+
+    Entries live in `library.db` (SQLite, WAL mode) with one row per
+    (kind, key), where kind is "id" or "hash", and an index on the file path,
+    so lookups, registration and removal are all indexed regardless of
+    library size, and several workers or muse-cli processes can use it at
+    once.
+    """
+
+    def __init__(self, config_dir, output_base=None, use_fingerprints=True,
+                 hash_algorithm="sha256"):
         os.makedirs(config_dir, exist_ok=True)
-        self.hash_db_file = os.path.join(config_dir, "hashes.txt")
-        self._db = None  # lazy-loaded in-memory cache
+        self.db = Database(os.path.join(config_dir, "library.db"), _SCHEMA)
+        self.hash_algorithm = resolve_hash_algorithm(hash_algorithm)
+        # Acoustic fingerprints catch the same recording from another upload;
+        # disabled when numpy is missing.
+        self.fingerprints = None
+        if use_fingerprints and fingerprint.available():
+            self.fingerprints = fingerprint.FingerprintIndex(
+                os.path.join(config_dir, "fingerprints.db")
+            )
 
-        # Migrate old hash DB from music folder if it exists
+        # One-time import of the old text databases
+        self.config_dir = config_dir
+        self._migrate_text_db(os.path.join(config_dir, "hashes.txt"))
         if output_base:
-            old_db = os.path.join(output_base, ".muse_hashes.txt")
-            if os.path.exists(old_db) and not os.path.exists(self.hash_db_file):
-                shutil.move(old_db, self.hash_db_file)
-            elif os.path.exists(old_db) and os.path.exists(self.hash_db_file):
-                # Merge old entries into new file, then remove old
-                with open(old_db, "r") as f:
-                    old_lines = f.readlines()
-                with open(self.hash_db_file, "a") as f:
-                    f.writelines(old_lines)
-                os.remove(old_db)
+            self._migrate_text_db(os.path.join(output_base, ".muse_hashes.txt"))
+        self._migrate_hash_format()
+        self._migrate_hash_algorithm()
+
+    def _migrate_text_db(self, path: str):
+        """Import a "kind:key:filepath" per line text database, then move it
+        into the config dir as `<name>.migrated`. Its whole-file hashes are
+        dropped; the files are rehashed on demand like rescanned ones."""
+        if not os.path.exists(path):
+            return
+        rows = []
+        paths = set()
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    parts = line.strip().split(":", 2)
+                    if len(parts) == 3 and parts[0] in ("id", "hash"):
+                        paths.add(parts[2])
+                        if parts[0] == "id":
+                            rows.append(tuple(parts))
+            with self.db.transaction() as conn:
+                conn.executemany(_UPSERT, rows)
+            self._record_sizes(paths)
+            backup = os.path.basename(path).lstrip(".") + ".migrated"
+            shutil.move(path, os.path.join(self.config_dir, backup))
+        except Exception as e:
+            print(f"{YELLOW}⚠️  Could not migrate {path}: {e}{RESET}")
+
+    def _record_sizes(self, paths):
+        """Record the payload size of files that have none yet, so a
+        download of the same length gets them hashed (_unhashed_with_size)."""
+        known = {p for (p,) in self.db.execute("SELECT filepath FROM sizes")}
+        rows = []
+        for path in paths:
+            if path in known:
+                continue
+            try:
+                rows.append((path, audio_payload_size(path)))
+            except OSError:
+                continue
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO sizes (filepath, size) VALUES (?, ?)", rows
+            )
+
+    def _migrate_hash_format(self):
+        """Drop content hashes registered before HASH_FORMAT was recorded:
+        they may be whole-file digests imported from hashes.txt. The files
+        are rehashed lazily, or by --rescan; unchanged files are answered
+        from the hash cache, which only ever held payload hashes."""
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE name = 'hash_format'"
+        ).fetchone()
+        if row and row[0] == HASH_FORMAT:
+            return
+        paths = [p for (p,) in self.db.execute(
+            "SELECT filepath FROM entries WHERE kind = 'hash'"
+        )]
+        self._record_sizes(paths)
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE kind = 'hash'")
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('hash_format', ?)",
+                (HASH_FORMAT,),
+            )
+
+    def _migrate_hash_algorithm(self):
+        """Rehash registered files when `hash_algorithm` changed, so old and
+        new digests are never compared."""
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE name = 'hash_algorithm'"
+        ).fetchone()
+        # Databases from before the setting existed hold sha256 digests
+        current = row[0] if row else "sha256"
+        if current != self.hash_algorithm:
+            from concurrent.futures import ProcessPoolExecutor
+
+            paths = [p for (p,) in self.db.execute(
+                "SELECT filepath FROM entries WHERE kind = 'hash'"
+            ) if os.path.exists(p)]
+            if paths:
+                print(f"{CYAN}🔄 Rehashing {len(paths)} songs with {self.hash_algorithm}...{RESET}")
+            with ProcessPoolExecutor() as pool:
+                digests = list(pool.map(
+                    partial(_try_audio_hash, algorithm=self.hash_algorithm),
+                    paths, chunksize=4,
+                )) if paths else []
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM entries WHERE kind = 'hash'")
+                conn.execute("DELETE FROM hash_cache")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO entries (kind, key, filepath) VALUES ('hash', ?, ?)",
+                    [(h, p) for p, h in zip(paths, digests) if h],
+                )
+        if not row or current != self.hash_algorithm:
+            with self.db.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('hash_algorithm', ?)",
+                    (self.hash_algorithm,),
+                )
 
     # ── Hashing ──────────────────────────────────────────────────────────────
 
-    def compute_file_hash(self, filepath: str, chunk_size: int = 8192) -> str | None:
-        """Compute SHA256 hash of a file."""
-        sha256 = hashlib.sha256()
+    def compute_file_hash(self, filepath: str, chunk_size: int = READ_BUFFER) -> str | None:
+        """Compute the digest of a whole file."""
+        hasher = _new_hasher(self.hash_algorithm)
         try:
             with open(filepath, "rb") as f:
                 for chunk in iter(lambda: f.read(chunk_size), b""):
-                    sha256.update(chunk)
-            return sha256.hexdigest()
+                    hasher.update(chunk)
+            return hasher.hexdigest()
         except Exception as e:
             print(f"{RED}⚠️  Error computing hash: {e}{RESET}")
             return None
 
+    def compute_fingerprint(self, filepath: str):
+        """Acoustic fingerprint of a file, or None when fingerprinting is off."""
+        if self.fingerprints is None:
+            return None
+        return fingerprint.compute_fingerprint(filepath)
+
+    def compute_audio_hash(self, filepath: str) -> str | None:
+        """Digest of the audio payload only (tags excluded), so the hash
+        stays the same before and after tagging. Files whose device, inode,
+        size and mtime are unchanged are answered from the hash cache
+        without being read."""
+        try:
+            st = os.stat(filepath)
+            cached = self._cached_hash(st)
+            if cached:
+                return cached
+            file_hash = audio_hash(filepath, self.hash_algorithm)
+        except Exception as e:
+            print(f"{RED}⚠️  Error computing hash: {e}{RESET}")
+            return None
+        self._remember_hash(st, file_hash)
+        return file_hash
+
+    def _cached_hash(self, st: os.stat_result) -> str | None:
+        row = self.db.execute(
+            "SELECT hash FROM hash_cache WHERE dev = ? AND ino = ? AND size = ?"
+            " AND mtime_ns = ? AND algorithm = ?",
+            (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, self.hash_algorithm),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _remember_hash(self, st: os.stat_result, file_hash: str):
+        try:
+            with self.db.transaction() as conn:
+                conn.execute(_CACHE_UPSERT, _cache_row(st, self.hash_algorithm, file_hash))
+        except Exception:
+            pass  # the cache is only an optimization
+
     # ── Database I/O ─────────────────────────────────────────────────────────
 
+    def lookup(self, kind: str, key: str) -> str | None:
+        """Filepath registered under (kind, key), if any."""
+        row = self.db.execute(
+            "SELECT filepath FROM entries WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        return row[0] if row else None
+
     def load_hash_database(self) -> dict:
         """
         Returns a dict of:
           { "hash:<sha256>": filepath, "id:<youtube_id>": filepath }
-        Uses in-memory cache after first load.
+        Reads the whole table; lookups don't need this.
         """
-        if self._db is not None:
-            return self._db
-
-        if not os.path.exists(self.hash_db_file):
-            self._db = {}
-            return self._db
-
-        db = {}
-        try:
-            with open(self.hash_db_file, "r") as f:
-                for line in f:
-                    line = line.strip()
-                    if line and ":" in line:
-                        # format: "hash:<sha256>:<filepath>"  or  "id:<video_id>:<filepath>"
-                        parts = line.split(":", 2)
-                        if len(parts) == 3:
-                            kind, key, filepath = parts
-                            db[f"{kind}:{key}"] = filepath
-        except Exception as e:
-            print(f"{YELLOW}⚠️  Error loading hash database: {e}{RESET}")
-
-        self._db = db
-        return self._db
+        rows = self.db.execute("SELECT kind, key, filepath FROM entries")
+        return {f"{kind}:{key}": filepath for kind, key, filepath in rows}
 
     def _save_entry(self, kind: str, key: str, filepath: str):
-        """Append a single entry to the database file and update cache."""
         try:
-            os.makedirs(os.path.dirname(self.hash_db_file) or ".", exist_ok=True)
-            with open(self.hash_db_file, "a") as f:
-                f.write(f"{kind}:{key}:{filepath}\n")
+            with self.db.transaction() as conn:
+                conn.execute(_UPSERT, (kind, key, filepath))
         except Exception as e:
             print(f"{YELLOW}⚠️  Error saving to hash database: {e}{RESET}")
-        # Update in-memory cache
-        if self._db is not None:
-            self._db[f"{kind}:{key}"] = filepath
 
     def remove_entries(self, video_id: str, filepath: str):
         """Remove all entries matching this video ID or filepath from the database."""
-        # Update in-memory cache
-        if self._db is not None:
-            keys_to_remove = [
-                k for k, v in self._db.items()
-                if k == f"id:{video_id}" or v == filepath
-            ]
-            for k in keys_to_remove:
-                del self._db[k]
-
-        if not os.path.exists(self.hash_db_file):
-            return
+        if self.fingerprints is not None:
+            self.fingerprints.remove(filepath)
         try:
-            with open(self.hash_db_file, "r") as f:
-                lines = f.readlines()
-            with open(self.hash_db_file, "w") as f:
-                for line in lines:
-                    # Keep lines that don't match this video ID or filepath
-                    if f"id:{video_id}:" not in line and filepath not in line:
-                        f.write(line)
+            with self.db.transaction() as conn:
+                conn.execute(
+                    "DELETE FROM entries WHERE kind = 'id' AND key = ?", (video_id,)
+                )
+                conn.execute("DELETE FROM entries WHERE filepath = ?", (filepath,))
+                conn.execute("DELETE FROM sizes WHERE filepath = ?", (filepath,))
         except Exception as e:
-            print(f"{YELLOW}⚠️  Could not clean database: {e}{RESET}")        
+            print(f"{YELLOW}⚠️  Could not clean database: {e}{RESET}")
 
     def save_hash_to_database(self, file_hash: str, filepath: str):
         self._save_entry("hash", file_hash, filepath)
@@ -122,39 +419,159 @@ class DuplicateChecker:
         if not video_id:
             return False, None
 
-        db = self.load_hash_database()
-        key = f"id:{video_id}"
-
-        if key in db:
-            existing = db[key]
+        existing = self.lookup("id", video_id)
+        if existing:
             if os.path.exists(existing):
                 return True, existing
             # File was deleted — remove stale entry silently
 
         return False, None
 
-    def is_duplicate(self, filepath: str) -> tuple[bool, str | None]:
+    def is_duplicate(self, filepath: str, file_hash: str | None = None) -> tuple[bool, str | None]:
         """
-        Check after downloading — compares file content hash.
+        Check after downloading — compares the audio content hash.
         Fallback for cases where we don't have a video ID.
+        Pass `file_hash` when it was already computed to avoid a second read.
         """
-        file_hash = self.compute_file_hash(filepath)
+        if file_hash is None:
+            file_hash = self.compute_audio_hash(filepath)
         if not file_hash:
             return False, None
 
-        db = self.load_hash_database()
-        key = f"hash:{file_hash}"
-
-        if key in db:
-            existing = db[key]
+        existing = self.lookup("hash", file_hash)
+        if existing:
             if os.path.exists(existing):
                 return True, existing
+            return False, None
+
+        # Files found by --rescan are only hashed once another file with the
+        # same payload length shows up
+        try:
+            size = audio_payload_size(filepath)
+        except OSError:
+            return False, None
+        for other in self._unhashed_with_size(size):
+            other_hash = self.compute_audio_hash(other)
+            if other_hash:
+                self._save_entry("hash", other_hash, other)
+            if other_hash == file_hash:
+                return True, other
 
         return False, None
 
+    def _unhashed_with_size(self, size: int) -> list[str]:
+        rows = self.db.execute(
+            "SELECT filepath FROM sizes WHERE size = ? AND NOT EXISTS ("
+            "  SELECT 1 FROM entries WHERE kind = 'hash' AND filepath = sizes.filepath"
+            ")", (size,)
+        )
+        return [path for (path,) in rows if path and os.path.exists(path)]
+
     def register(self, video_id: str, file_hash: str, filepath: str):
         """Save both the video ID and file hash after a successful download."""
-        if video_id:
-            self.save_id_to_database(video_id, filepath)
-        if file_hash:
-            self.save_hash_to_database(file_hash, filepath)
+        rows = [(kind, key, filepath)
+                for kind, key in (("id", video_id), ("hash", file_hash)) if key]
+        try:
+            size = audio_payload_size(filepath)
+            st = os.stat(filepath)
+        except OSError:
+            size = st = None
+        try:
+            with self.db.transaction() as conn:
+                conn.executemany(_UPSERT, rows)
+                if size is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sizes (filepath, size) VALUES (?, ?)",
+                        (filepath, size),
+                    )
+                # Tagging changed the mtime but not the audio, so the tagged
+                # file is cached under the hash of its untagged payload
+                if st is not None and file_hash:
+                    conn.execute(_CACHE_UPSERT, _cache_row(st, self.hash_algorithm, file_hash))
+        except Exception as e:
+            print(f"{YELLOW}⚠️  Error saving to hash database: {e}{RESET}")
+
+    def is_near_duplicate(self, fp) -> tuple[bool, str | None]:
+        """
+        Check after downloading — compares acoustic fingerprints, so the same
+        recording from a different upload (Topic, VEVO, lyric video) matches
+        even though its bytes differ.
+        """
+        if self.fingerprints is None or fp is None:
+            return False, None
+        match = self.fingerprints.find_match(fp)
+        if match:
+            return True, match[0]
+        return False, None
+
+    def register_fingerprint(self, fp, filepath: str):
+        if self.fingerprints is not None and fp is not None:
+            self.fingerprints.add(filepath, fp)
+
+    # ── Library rescan ───────────────────────────────────────────────────────
+
+    def library_snapshot(self) -> tuple[dict, dict, set]:
+        """Recorded state: ({filepath: payload size}, {filepath: audio hash},
+        every filepath the database refers to)."""
+        sizes = dict(self.db.execute("SELECT filepath, size FROM sizes"))
+        hashes = dict(self.db.execute(
+            "SELECT filepath, key FROM entries WHERE kind = 'hash'"
+        ))
+        paths = {p for (p,) in self.db.execute("SELECT DISTINCT filepath FROM entries")}
+        return sizes, hashes, paths | set(sizes)
+
+    def hash_cache_snapshot(self) -> dict:
+        """{(dev, ino): (size, mtime_ns, hash)} for the active algorithm."""
+        rows = self.db.execute(
+            "SELECT dev, ino, size, mtime_ns, hash FROM hash_cache WHERE algorithm = ?",
+            (self.hash_algorithm,),
+        )
+        return {(dev, ino): (size, mtime, h) for dev, ino, size, mtime, h in rows}
+
+    def reconcile(self, sizes: dict, new_hashes: dict, moved: dict, stale: list,
+                  stats: dict | None = None, file_hashes: dict | None = None,
+                  unhashed: list = ()):
+        """Apply a library scan in one transaction.
+
+        sizes        {filepath: payload size} for every audio file on disk
+        new_hashes   {filepath: hash} for files hashed during the scan
+        moved        {old filepath: new filepath}
+        stale        filepaths that no longer exist
+        stats        {filepath: os.stat_result} and
+        file_hashes  {filepath: hash} of every file whose hash is known to be
+                     current; the hash cache is rebuilt from these so it
+                     only covers files still in the library
+        unhashed     filepaths whose registered hash is outdated
+        """
+        with self.db.transaction() as conn:
+            if stats is not None:
+                conn.execute("DELETE FROM hash_cache")
+                conn.executemany(_CACHE_UPSERT, [
+                    _cache_row(stats[path], self.hash_algorithm, h)
+                    for path, h in (file_hashes or {}).items() if path in stats
+                ])
+            conn.executemany(
+                "UPDATE entries SET filepath = ? WHERE filepath = ?",
+                [(new, old) for old, new in moved.items()],
+            )
+            conn.executemany(
+                "DELETE FROM entries WHERE filepath = ?", [(p,) for p in stale]
+            )
+            conn.executemany(
+                "DELETE FROM entries WHERE kind = 'hash' AND filepath = ?",
+                [(p,) for p in [*unhashed, *new_hashes]],
+            )
+            # Identical copies keep the path already registered for the hash
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries (kind, key, filepath) VALUES ('hash', ?, ?)",
+                [(h, p) for p, h in new_hashes.items()],
+            )
+            conn.execute("DELETE FROM sizes")
+            conn.executemany(
+                "INSERT INTO sizes (filepath, size) VALUES (?, ?)", sizes.items()
+            )
+        if self.fingerprints is not None:
+            for old, new in moved.items():
+                self.fingerprints.rename(old, new)
+            for path in stale:
+                self.fingerprints.remove(path)
@@ -0,0 +1,435 @@
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import threading
+
+from . import ratelimit
+
+# yt-dlp backends. Both engines expose the same three calls and return plain
+# info dicts, so callers don't care whether yt-dlp runs in this process or in
+# a child process:
+#
+#   extract_info(url)                         -> info dict for one video
+#   search(query, max_results)                -> list of flat entry dicts
+#   download(url, template, fmt, on_percent)  -> final audio path (or None)
+#
+# and get_engine() adds
+#
+#   search_many(queries, max_results)         -> (query, entries or None)
+#                                                 as each query resolves
+#
+# which runs a whole batch of searches in one `yt-dlp` process with the
+# subprocess engine, instead of starting one per query. The in-process
+# engine already reuses one YoutubeDL per worker, so it searches in turn.
+
+_DELIM = "|||"
+
+# Marks the line `download` prints with the source URL and description
+_DETAILS_PREFIX = "muse-details:"
+
+_LANG_ARGS = [
+    "--add-header", "Accept-Language:en-US,en;q=0.9",
+    "--extractor-args", "youtube:lang=en",
+]
+
+# YouTube Music fields, reported for "- Topic" and other label uploads
+_MUSIC_FIELDS = ["track", "album", "release_year", "release_date", "creator"]
+
+# Fields requested from `yt-dlp --print` by the subprocess engine
+_INFO_FIELDS = ["artist", "title", "uploader", "channel", "id", "thumbnail",
+                *_MUSIC_FIELDS]
+# Search results are fully resolved by the subprocess engine, so they carry
+# the fields has_video_info() needs to skip a second extraction
+_SEARCH_FIELDS = ["id", "title", "uploader", "duration_string",
+                  "artist", "channel", "thumbnail"]
+# search_many: for ytsearch targets the playlist id is the query itself
+_BULK_FIELDS = ["playlist_id", *_SEARCH_FIELDS]
+
+
+def _none_if_na(value: str):
+    value = value.strip()
+    return None if value in ("", "NA") else value
+
+
+def _search_entry(parts: list) -> dict:
+    return {f: _none_if_na(v) for f, v in zip(_SEARCH_FIELDS, parts)}
+
+
+class SubprocessEngine:
+    """Runs a fresh `yt-dlp` process per call and parses its stdout."""
+
+    name = "subprocess"
+
+    def extract_info(self, url: str) -> dict:
+        info_cmd = [
+            "yt-dlp", "--no-playlist", "--quiet",
+            "--print", "\n".join(f"%({f})s" for f in _INFO_FIELDS),
+            *_LANG_ARGS,
+            url
+        ]
+        try:
+            result = subprocess.run(
+                info_cmd, capture_output=True, text=True, check=True, timeout=30
+            )
+        except subprocess.TimeoutExpired:
+            raise Exception("[E01] Timeout fetching video info — check your connection")
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"[E02] yt-dlp failed: {e.stderr.strip()}")
+
+        lines = result.stdout.strip().split("\n")
+        while len(lines) < len(_INFO_FIELDS):
+            lines.append("")
+        return {f: _none_if_na(v) for f, v in zip(_INFO_FIELDS, lines)}
+
+    def search(self, query: str, max_results: int) -> list:
+        search_cmd = [
+            "yt-dlp",
+            f"ytsearch{max_results}:{query}",
+            "--print", _DELIM.join(f"%({f})s" for f in _SEARCH_FIELDS),
+            "--skip-download",
+            "--no-warnings",
+            *_LANG_ARGS,
+        ]
+        result = subprocess.run(
+            search_cmd, capture_output=True, text=True, check=True, timeout=30
+        )
+        entries = []
+        for line in result.stdout.strip().split("\n"):
+            if line and _DELIM in line:
+                parts = line.split(_DELIM, len(_SEARCH_FIELDS) - 1)
+                if len(parts) == len(_SEARCH_FIELDS):
+                    entries.append(_search_entry(parts))
+        return entries
+
+    def search_many(self, queries: list, max_results: int, sleep: float = 0.0):
+        """Search every query in one yt-dlp run, yielding (query, entries)
+        as results are printed. A query that printed nothing is yielded
+        with [] as soon as a later one resolves (no results, or its search
+        failed); None marks queries this run could not search. `sleep`
+        seconds are left between requests."""
+        queries = list(dict.fromkeys(q.strip() for q in queries if q.strip()))
+        # yt-dlp's batch-file reader cuts lines at " #" (a comment)
+        unsafe = [q for q in queries if "#" in q]
+        queries = [q for q in queries if "#" not in q]
+        if not queries:
+            for query in unsafe:
+                yield query, None
+            return
+        bulk_cmd = [
+            "yt-dlp",
+            "--batch-file", "-",     # one target per line on stdin
+            "--print", _DELIM.join(f"%({f})s" for f in _BULK_FIELDS),
+            "--skip-download",
+            "--no-warnings",
+            "--ignore-errors",       # one failed search must not end the run
+            "--sleep-requests", f"{sleep:.2f}",
+            *_LANG_ARGS,
+        ]
+        proc = subprocess.Popen(
+            bulk_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, bufsize=1,
+        )
+        try:
+            proc.stdin.write("".join(f"ytsearch{max_results}:{q}\n" for q in queries))
+            proc.stdin.close()
+            for query in unsafe:
+                yield query, None
+
+            position = {q: i for i, q in enumerate(queries)}
+            done = 0            # queries before this index have been yielded
+            entries = []
+            for line in proc.stdout:
+                parts = line.rstrip("\n").split(_DELIM, len(_BULK_FIELDS) - 1)
+                if len(parts) != len(_BULK_FIELDS) or parts[0] not in position:
+                    continue
+                index = position[parts[0]]
+                if index < done:
+                    continue
+                if entries and index > done:
+                    yield queries[done], entries
+                    done, entries = done + 1, []
+                # Targets are searched in order: the ones in between printed
+                # nothing
+                while done < index:
+                    yield queries[done], []
+                    done += 1
+                entries.append(_search_entry(parts[1:]))
+                if len(entries) >= max_results:
+                    yield queries[done], entries
+                    done, entries = done + 1, []
+            if entries:
+                yield queries[done], entries
+                done += 1
+            proc.wait()
+            # A non-zero exit means some search failed; the run may have
+            # stopped before the remaining queries
+            for query in queries[done:]:
+                yield query, [] if proc.returncode == 0 else None
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+    def download(self, url: str, output_template: str, audio_format: str,
+                 on_percent=None, details: dict | None = None) -> str | None:
+        download_cmd = [
+            "yt-dlp", "--no-playlist",
+            "--extract-audio",
+            "--audio-format", audio_format,
+            "--audio-quality", "0",
+            # Cover and tags are written by TagWriter in a single save
+            "--newline", "--progress",
+            "--progress-template", "download:%(progress.percentage)s",
+            # Report the final path so parallel workers sharing an album
+            # folder never pick up each other's files.
+            "--print", "after_move:filepath",
+            # Source URL and description for TagWriter, as one JSON line
+            "--print", f"after_move:{_DETAILS_PREFIX}%(.{{webpage_url,description}})j",
+            *_LANG_ARGS,
+            "-o", output_template,
+            url
+        ]
+        proc = subprocess.Popen(
+            download_cmd, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, text=True, bufsize=1
+        )
+        final_path = None
+        ext = f".{audio_format}"
+        for line in proc.stdout:
+            line = line.strip()
+            if line.startswith(_DETAILS_PREFIX):
+                if details is not None:
+                    try:
+                        details.update(json.loads(line[len(_DETAILS_PREFIX):]))
+                    except ValueError:
+                        pass
+                continue
+            if os.path.isabs(line) and line.endswith(ext):
+                final_path = line
+                continue
+            if line and not line.startswith('[') and on_percent:
+                m = re.search(r'(\d+\.?\d*)%', line)
+                if m:
+                    on_percent(float(m.group(1)))
+        proc.wait()
+        if proc.returncode != 0:
+            raise Exception(f"[E03] yt-dlp exited with code {proc.returncode}")
+        return final_path
+
+
+class _SilentLogger:
+    """Keeps yt-dlp from writing to the terminal; errors still surface as
+    DownloadError and are reported by the caller."""
+
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class InProcessEngine:
+    """Drives `yt_dlp.YoutubeDL` directly.
+
+    Instances are cached per thread (YoutubeDL is not thread-safe), so each
+    pipeline worker pays the extractor setup once and reuses it afterwards.
+    Progress comes from native progress hooks instead of parsed stdout.
+    """
+
+    name = "in-process"
+
+    def __init__(self):
+        if importlib.util.find_spec("yt_dlp") is None:
+            raise ImportError("No module named 'yt_dlp'")
+        self._module = None
+        self._local = threading.local()
+
+    @property
+    def _yt_dlp(self):
+        # Imported on first use: yt_dlp alone takes longer to import than the
+        # rest of muse-cli, and --config or a duplicate URL never needs it
+        if self._module is None:
+            import yt_dlp
+            self._module = yt_dlp
+        return self._module
+
+    def _base_params(self) -> dict:
+        return {
+            "quiet": True,
+            "no_warnings": True,
+            "noprogress": True,
+            "noplaylist": True,
+            "logger": _SilentLogger(),
+            "socket_timeout": 30,
+            "http_headers": {"Accept-Language": "en-US,en;q=0.9"},
+            "extractor_args": {"youtube": {"lang": ["en"]}},
+        }
+
+    def _ydl(self, key: str, params: dict):
+        """Return this thread's YoutubeDL for `key`, creating it once."""
+        instances = getattr(self._local, "instances", None)
+        if instances is None:
+            instances = self._local.instances = {}
+        ydl = instances.get(key)
+        if ydl is None:
+            ydl = instances[key] = self._yt_dlp.YoutubeDL(params)
+        return ydl
+
+    def _error(self, e: Exception, code: str, what: str) -> Exception:
+        msg = str(e).replace("ERROR: ", "").strip()
+        if "timed out" in msg.lower():
+            return Exception(f"[E01] Timeout {what} — check your connection")
+        return Exception(f"[{code}] yt-dlp failed: {msg}")
+
+    def extract_info(self, url: str) -> dict:
+        ydl = self._ydl("info", self._base_params())
+        try:
+            info = ydl.extract_info(url, download=False) or {}
+        except self._yt_dlp.utils.DownloadError as e:
+            raise self._error(e, "E02", "fetching video info")
+        # Same keys as the subprocess engine, even when YouTube has no
+        # music metadata for the video
+        for field in _MUSIC_FIELDS:
+            info.setdefault(field, None)
+        return info
+
+    def search(self, query: str, max_results: int) -> list:
+        params = self._base_params()
+        params["extract_flat"] = "in_playlist"
+        ydl = self._ydl("search", params)
+        try:
+            info = ydl.extract_info(f"ytsearch{max_results}:{query}", download=False)
+        except self._yt_dlp.utils.DownloadError as e:
+            raise self._error(e, "E02", "searching")
+        entries = []
+        for entry in (info or {}).get("entries") or []:
+            if not entry or not entry.get("id"):
+                continue
+            duration = entry.get("duration")
+            entries.append({
+                **entry,
+                "uploader": entry.get("uploader") or entry.get("channel") or "",
+                "duration_string": entry.get("duration_string") or (
+                    self._yt_dlp.utils.formatSeconds(duration) if duration else ""
+                ),
+            })
+        return entries
+
+    def _progress_hook(self, d: dict):
+        on_percent = getattr(self._local, "on_percent", None)
+        if not on_percent or d.get("status") != "downloading":
+            return
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        if total:
+            on_percent(d.get("downloaded_bytes", 0) * 100.0 / total)
+
+    def download(self, url: str, output_template: str, audio_format: str,
+                 on_percent=None, details: dict | None = None) -> str | None:
+        params = self._base_params()
+        params.update({
+            "format": "bestaudio/best",
+            "outtmpl": {"default": output_template},
+            "postprocessors": [
+                # Cover and tags are written by TagWriter in a single save
+                {"key": "FFmpegExtractAudio",
+                 "preferredcodec": audio_format, "preferredquality": "0"},
+            ],
+            "progress_hooks": [self._progress_hook],
+        })
+        ydl = self._ydl(f"download:{audio_format}", params)
+        ydl.params["outtmpl"]["default"] = output_template
+        self._local.on_percent = on_percent
+        try:
+            info = ydl.extract_info(url, download=True) or {}
+        except self._yt_dlp.utils.DownloadError as e:
+            raise self._error(e, "E03", "downloading")
+        finally:
+            self._local.on_percent = None
+        if details is not None:
+            details.update(webpage_url=info.get("webpage_url"),
+                           description=info.get("description"))
+        downloads = info.get("requested_downloads") or []
+        return downloads[0].get("filepath") if downloads else None
+
+
+class RateLimitedEngine:
+    """Wraps an engine so every YouTube request takes a token from the
+    shared "youtube" bucket, and 429/503 answers slow all workers down."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.name = engine.name
+
+    def _call(self, func, *args):
+        limit = ratelimit.limiter("youtube")
+        limit.acquire()
+        try:
+            return func(*args)
+        except Exception as e:
+            if ratelimit.http_status(e) in (429, 503):
+                limit.backoff(ratelimit.retry_after(e))
+            raise
+
+    def extract_info(self, url: str) -> dict:
+        return self._call(self.engine.extract_info, url)
+
+    def search(self, query: str, max_results: int) -> list:
+        return self._call(self.engine.search, query, max_results)
+
+    def search_many(self, queries: list, max_results: int):
+        """(query, entries or None) for every query, as each resolves."""
+        limit = ratelimit.limiter("youtube")
+        if hasattr(self.engine, "search_many"):
+            # yt-dlp paces its own requests; the tokens keep other workers
+            # and processes in step with it
+            for query, entries in self.engine.search_many(
+                queries, max_results, sleep=1.0 / limit.rate
+            ):
+                limit.acquire()
+                yield query, entries
+            return
+        for query in dict.fromkeys(q.strip() for q in queries if q.strip()):
+            try:
+                yield query, self.search(query, max_results)
+            except Exception:
+                yield query, None
+
+    def download(self, url: str, output_template: str, audio_format: str,
+                 on_percent=None, details: dict | None = None) -> str | None:
+        return self._call(self.engine.download, url, output_template,
+                          audio_format, on_percent, details)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def set_engine(name: str = "auto"):
+    """Select the yt-dlp backend: "in-process", "subprocess" or "auto".
+
+    "auto" uses the in-process engine when the yt_dlp package can be
+    imported and falls back to spawning the yt-dlp binary otherwise.
+    """
+    global _engine
+    with _engine_lock:
+        if name == "subprocess":
+            engine = SubprocessEngine()
+        else:
+            try:
+                engine = InProcessEngine()
+            except ImportError:
+                engine = SubprocessEngine()
+        _engine = RateLimitedEngine(engine)
+        return _engine
+
+
+def get_engine():
+    """Return the active engine, picking one automatically on first use."""
+    if _engine is None:
+        return set_engine("auto")
+    return _engine
@@ -0,0 +1,293 @@
+import importlib.util
+import os
+import subprocess
+
+from .db import Database
+
+# Acoustic fingerprints for near-duplicate detection (same recording from a
+# Topic channel, a VEVO upload, a lyric video, ...).
+#
+# A fingerprint has two parts, both computed from one ffmpeg decode:
+#
+#   codes   — one 24-bit code per ~46 ms frame. Each bit is the sign of the
+#             change over time of the energy difference between two adjacent
+#             frequency bands (Haitsma–Kalker style), so codes survive
+#             re-encoding and volume changes. Used to verify a match by bit
+#             error rate at the right alignment.
+#   hashes  — (key, frame) landmarks: pairs of strong spectral peaks hashed
+#             as (anchor frequency, frequency delta, time delta). Peaks
+#             survive re-encoding, so the same keys show up in every upload
+#             of a recording. They feed an inverted index, so a lookup only
+#             touches tracks that share keys with the query and never scans
+#             the library.
+#
+# Requires numpy and ffmpeg; without them fingerprinting is disabled.
+
+SAMPLE_RATE = 5512
+WINDOW = 2048
+HOP = 256
+MAX_SECONDS = 150
+BAND_EDGES_HZ = (300, 3000)
+N_BITS = 24
+
+PEAK_NEIGHBORHOOD = (15, 31)  # frames × bins a peak must dominate
+PEAKS_PER_BLOCK = 5           # strongest peaks kept per ~1 s block
+BLOCK_FRAMES = 21
+FAN_OUT = 3                   # targets paired with each anchor peak
+MAX_DT = 63                   # frames between anchor and target
+MAX_DF = 127                  # bins between anchor and target
+MAX_KEYS = 96                 # landmarks indexed per track
+
+MIN_SHARED_KEYS = 3   # landmarks with a consistent offset before verifying
+MIN_OVERLAP = 200     # frames that must overlap when comparing codes
+BER_THRESHOLD = 0.30  # bit error rate below which two tracks match
+MAX_CANDIDATES = 10
+
+# numpy is the slowest import in muse-cli; it is loaded by the first
+# fingerprint instead of at startup
+np = None
+
+
+def _load_numpy() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+def available() -> bool:
+    """True when numpy is installed (ffmpeg is checked at startup), without
+    importing it."""
+    return np is not None or importlib.util.find_spec("numpy") is not None
+
+
+def _band_matrix():
+    freqs = np.fft.rfftfreq(WINDOW, 1.0 / SAMPLE_RATE)
+    edges = np.geomspace(BAND_EDGES_HZ[0], BAND_EDGES_HZ[1], N_BITS + 2)
+    matrix = np.zeros((len(freqs), N_BITS + 1), dtype=np.float32)
+    for b in range(N_BITS + 1):
+        matrix[(freqs >= edges[b]) & (freqs < edges[b + 1]), b] = 1.0
+    return matrix
+
+
+def _decode_pcm(filepath: str):
+    cmd = [
+        "ffmpeg", "-v", "quiet", "-i", filepath,
+        "-t", str(MAX_SECONDS), "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-f", "s16le", "-",
+    ]
+    result = subprocess.run(cmd, capture_output=True, timeout=120)
+    if result.returncode != 0:
+        return None
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32)
+
+
+class Fingerprint:
+    def __init__(self, codes, hashes):
+        self.codes = codes      # np.uint32 array, one code per frame
+        self.hashes = hashes    # [(key, frame), ...] strongest first
+
+
+def _spectrum(pcm):
+    frames = np.lib.stride_tricks.sliding_window_view(pcm, WINDOW)[::HOP]
+    return np.abs(np.fft.rfft(frames * np.hanning(WINDOW), axis=1)) ** 2
+
+
+def _codes(spectrum):
+    energy = spectrum @ _band_matrix()                  # (frames, bands)
+    band_diff = energy[:, :-1] - energy[:, 1:]          # (frames, N_BITS)
+    bits = (band_diff[1:] - band_diff[:-1]) > 0         # (frames-1, N_BITS)
+    weights = (1 << np.arange(N_BITS, dtype=np.uint32))
+    return (bits.astype(np.uint32) * weights).sum(axis=1).astype(np.uint32)
+
+
+def _max_filter(x, size, axis):
+    pad = [(0, 0)] * x.ndim
+    pad[axis] = (size // 2, size // 2)
+    padded = np.pad(x, pad, mode="edge")
+    return np.lib.stride_tricks.sliding_window_view(padded, size, axis=axis).max(axis=-1)
+
+
+def _landmarks(spectrum):
+    """Hash pairs of spectral peaks; returns [(key, frame)] strongest first."""
+    freqs = np.fft.rfftfreq(WINDOW, 1.0 / SAMPLE_RATE)
+    lo, hi = np.searchsorted(freqs, BAND_EDGES_HZ)
+    logs = np.log(spectrum[:, lo:hi] + 1e-9).astype(np.float32)
+
+    local_max = _max_filter(_max_filter(logs, PEAK_NEIGHBORHOOD[0], 0),
+                            PEAK_NEIGHBORHOOD[1], 1)
+    t_idx, f_idx = np.nonzero((logs == local_max) & (logs > np.median(logs)))
+    strength = logs[t_idx, f_idx]
+
+    # Keep only the strongest few peaks per block so density is even
+    keep = []
+    block = t_idx // BLOCK_FRAMES
+    for b in np.unique(block):
+        members = np.flatnonzero(block == b)
+        keep.extend(members[np.argsort(-strength[members])[:PEAKS_PER_BLOCK]])
+    keep = np.array(sorted(keep, key=lambda i: (t_idx[i], f_idx[i])), dtype=int)
+    t_idx, f_idx, strength = t_idx[keep], f_idx[keep], strength[keep]
+
+    pairs = []
+    for i in range(len(t_idx)):
+        targets = 0
+        for j in range(i + 1, len(t_idx)):
+            dt = t_idx[j] - t_idx[i]
+            if dt > MAX_DT:
+                break
+            df = f_idx[j] - f_idx[i]
+            if dt < 1 or abs(df) > MAX_DF:
+                continue
+            key = ((int(f_idx[i]) >> 1) << 14) | ((int(df) + MAX_DF) << 6) | int(dt)
+            pairs.append((float(strength[i] + strength[j]), key, int(t_idx[i])))
+            targets += 1
+            if targets >= FAN_OUT:
+                break
+    pairs.sort(key=lambda p: -p[0])
+    return [(key, t) for _, key, t in pairs]
+
+
+def fingerprint_pcm(pcm) -> Fingerprint | None:
+    """Fingerprint mono PCM sampled at SAMPLE_RATE."""
+    _load_numpy()
+    if pcm is None or len(pcm) < WINDOW + 2 * HOP:
+        return None
+    spectrum = _spectrum(pcm)
+    return Fingerprint(_codes(spectrum), _landmarks(spectrum))
+
+
+def compute_fingerprint(filepath: str) -> Fingerprint | None:
+    """Decode an audio file with ffmpeg and fingerprint it."""
+    if not _load_numpy():
+        return None
+    try:
+        return fingerprint_pcm(_decode_pcm(filepath))
+    except Exception:
+        return None
+
+
+def _popcount(x):
+    return np.unpackbits(x.view(np.uint8)).reshape(len(x), -1).sum(axis=1)
+
+
+def bit_error_rate(a, b, offset: int) -> float:
+    """Bit error rate between code arrays with `a[offset + i]` aligned to
+    `b[i]`; 1.0 when they overlap too little to compare."""
+    if offset >= 0:
+        x, y = a[offset:], b
+    else:
+        x, y = a, b[-offset:]
+    n = min(len(x), len(y))
+    if n < MIN_OVERLAP:
+        return 1.0
+    errors = _popcount(np.bitwise_xor(x[:n], y[:n])).sum()
+    return errors / (n * N_BITS)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id       INTEGER PRIMARY KEY,
+    filepath TEXT UNIQUE NOT NULL,
+    codes    BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS landmarks (
+    key      INTEGER NOT NULL,
+    track_id INTEGER NOT NULL,
+    frame    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS landmarks_by_key ON landmarks(key);
+CREATE INDEX IF NOT EXISTS landmarks_by_track ON landmarks(track_id)
+"""
+
+
+class FingerprintIndex:
+    """SQLite-backed inverted index: landmark key → (track, frame)."""
+
+    def __init__(self, db_path: str):
+        self.db = Database(db_path, _SCHEMA)
+
+    def add(self, filepath: str, fp: Fingerprint | None):
+        """Index a track (replacing any previous entry for the path)."""
+        if fp is None:
+            return
+        with self.db.transaction() as conn:
+            self._remove(conn, filepath)
+            cur = conn.execute(
+                "INSERT INTO tracks (filepath, codes) VALUES (?, ?)",
+                (filepath, fp.codes.astype(np.uint32).tobytes()),
+            )
+            conn.executemany(
+                "INSERT INTO landmarks (key, track_id, frame) VALUES (?, ?, ?)",
+                [(key, cur.lastrowid, t) for key, t in fp.hashes[:MAX_KEYS]],
+            )
+
+    @staticmethod
+    def _remove(conn, filepath: str):
+        row = conn.execute(
+            "SELECT id FROM tracks WHERE filepath = ?", (filepath,)
+        ).fetchone()
+        if row:
+            conn.execute("DELETE FROM landmarks WHERE track_id = ?", row)
+            conn.execute("DELETE FROM tracks WHERE id = ?", row)
+
+    def remove(self, filepath: str):
+        with self.db.transaction() as conn:
+            self._remove(conn, filepath)
+
+    def rename(self, old_path: str, new_path: str):
+        with self.db.transaction() as conn:
+            self._remove(conn, new_path)
+            conn.execute(
+                "UPDATE tracks SET filepath = ? WHERE filepath = ?",
+                (new_path, old_path),
+            )
+
+    def find_match(self, fp: Fingerprint | None) -> tuple[str, float] | None:
+        """Return (filepath, bit_error_rate) of the closest indexed track
+        that sounds the same, or None."""
+        if fp is None or not fp.hashes:
+            return None
+        query = {}
+        for key, t in fp.hashes:
+            query.setdefault(key, []).append(t)
+        keys = list(query)
+
+        # Vote for (track, alignment offset); a real match piles its votes
+        # onto one offset while chance key collisions scatter.
+        votes = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT key, track_id, frame FROM landmarks WHERE key IN "
+                f"({','.join('?' * len(chunk))})", chunk
+            )
+            for key, track_id, frame in rows:
+                for t in query[key]:
+                    slot = (track_id, (t - frame) // 2)
+                    votes[slot] = votes.get(slot, 0) + 1
+
+        best_offsets = {}
+        for (track_id, offset), n in votes.items():
+            if n >= MIN_SHARED_KEYS and n > best_offsets.get(track_id, (0, 0))[0]:
+                best_offsets[track_id] = (n, offset * 2)
+        candidates = sorted(best_offsets, key=lambda t: -best_offsets[t][0])
+        tracks = [
+            self.db.execute(
+                "SELECT id, filepath, codes FROM tracks WHERE id = ?", (t,)
+            ).fetchone()
+            for t in candidates[:MAX_CANDIDATES]
+        ]
+
+        best = None
+        for track_id, filepath, blob in filter(None, tracks):
+            ref = np.frombuffer(blob, dtype=np.uint32)
+            offset = best_offsets[track_id][1]
+            ber = min(bit_error_rate(fp.codes, ref, offset + d) for d in range(-1, 3))
+            if ber < BER_THRESHOLD and (best is None or ber < best[1]):
+                if os.path.exists(filepath):
+                    best = (filepath, ber)
+        return best
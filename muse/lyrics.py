@@ -1,8 +1,12 @@
-from mutagen.id3 import ID3, USLT
-from mutagen.mp4 import MP4
 import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 
+from . import ratelimit
+from .cache import DiskCache, DAY
 from .colors import GREEN, YELLOW, CYAN, DIM, RED, RESET
+from .tagging import TagWriter
 
 
 def _clean_for_search(text: str) -> str:
@@ -19,14 +23,9 @@ def _clean_for_search(text: str) -> str:
 
 
 def _embed_lyrics(file_path: str, lyrics_text: str, audio_format: str):
-    if audio_format == "mp3":
-        id3 = ID3(file_path)
-        id3["USLT"] = USLT(encoding=3, lang='eng', desc='desc', text=lyrics_text)
-        id3.save()
-    else:
-        audio = MP4(file_path)
-        audio["\xa9lyr"] = [lyrics_text]
-        audio.save()
+    tags = TagWriter(file_path, audio_format)
+    tags.set_lyrics(lyrics_text)
+    tags.save()
 
 
 def _titles_match(a: str, b: str) -> bool:
@@ -48,68 +47,256 @@ class LyricsResult:
         self.status = status
 
 
+# ── Lyrics cache ──────────────────────────────────────────────────────────────
+#
+# Lookups are cached on disk (cache.db, "lyrics" namespace) by normalized
+# title, artist and cover flag: the lyrics plus the title and artist Genius
+# matched. Songs Genius doesn't have are remembered for a shorter time, so
+# retrying a batch doesn't walk all four strategies again for them.
+
+HIT_TTL  = 90 * DAY
+MISS_TTL = 3 * DAY
+
+
+class CachedSong:
+    """The fields of a lyricsgenius Song that muse-cli uses."""
+
+    def __init__(self, title: str, artist: str, lyrics: str):
+        self.title = title
+        self.artist = artist
+        self.lyrics = lyrics
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r'[^\w\s]', '', text.lower()).split())
+
+
+def _cache_key(clean_title: str, clean_artist: str, is_cover: bool) -> str:
+    # Cover lookups search by title only, so the artist is not part of the key
+    artist = "" if is_cover else _normalize(clean_artist)
+    return json.dumps([_normalize(clean_title), artist, is_cover])
+
+
+# The artist walk (strategy 4) matches titles against the artist's most
+# popular songs. Only their Genius ids and titles are fetched — one artist
+# search and one song-list request — and kept per artist in the
+# "genius_artists" namespace, so a batch of one artist's songs makes those
+# two requests once and then fetches lyrics for the single matching song.
+
+CATALOG_SONGS    = 50
+CATALOG_TTL      = 30 * DAY
+CATALOG_MISS_TTL = 3 * DAY
+
+
+# Seconds a strategy may run before the next one is started alongside it
+HEDGE_DELAY = 0.5
+DEFAULT_CONCURRENCY = 3
+
+
 class LyricsManager:
-    def __init__(self, genius_token):
-        self.genius = None
-        if genius_token:
-            try:
-                import lyricsgenius
-                self.genius = lyricsgenius.Genius(
-                    genius_token,
-                    skip_non_songs=True,
-                    excluded_terms=["(Remix)", "(Live)"],
-                    remove_section_headers=False,
-                )
-                self.genius.verbose = False
-            except Exception as e:
-                print(f"{YELLOW}⚠  [E05] Genius init failed: {e}{RESET}")
+    def __init__(self, genius_token, cache: DiskCache | None = None,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 artist_cache: DiskCache | None = None):
+        self.genius_token = genius_token
+        self.cache = cache
+        self.artist_cache = artist_cache
+        self._catalog_locks = {}
+        self._catalog_locks_lock = threading.Lock()
+        self.concurrency = max(1, concurrency)
+        self._genius = None
+        self._init_failed = False
+        self._init_lock = threading.Lock()
+
+    @property
+    def genius(self):
+        """The Genius client, built on the first lookup: importing
+        lyricsgenius is slow, and most runs that never fetch lyrics
+        (--config, a duplicate URL) shouldn't pay for it."""
+        if self._genius is None and self.genius_token and not self._init_failed:
+            with self._init_lock:
+                if self._genius is None and not self._init_failed:
+                    try:
+                        import lyricsgenius
+                        genius = lyricsgenius.Genius(
+                            self.genius_token,
+                            skip_non_songs=True,
+                            excluded_terms=["(Remix)", "(Live)"],
+                            remove_section_headers=False,
+                        )
+                        genius.verbose = False
+                        # lyricsgenius keeps its requests.Session in _session;
+                        # swap in the shared one, which rate limits and retries
+                        from .sessions import session
+                        shared = session("genius")
+                        shared.headers.update(genius._session.headers)
+                        genius._session = shared
+                        genius.sleep_time = 0
+                        self._genius = genius
+                    except Exception as e:
+                        self._init_failed = True
+                        print(f"{YELLOW}⚠  [E05] Genius init failed: {e}{RESET}")
+        return self._genius
 
     def fetch_lyrics(self, title: str, artist: str,
                      user_query: str = "",
                      is_cover: bool = False):
-        """Network-only lyrics fetch. Returns (song, status_msg) or (None, status_msg)."""
-        if not self.genius:
+        """Lyrics lookup, answered from the cache when the song was looked
+        up before. Returns (song, status_msg) or (None, status_msg)."""
+        if not self.genius_token:
             return None, f"{YELLOW}⚠  Lyrics unavailable — no API token (run muse-cli --config){RESET}"
 
         clean_title  = _clean_for_search(title)
         clean_artist = _clean_for_search(artist)
 
-        # Strategy 1: covers — search title only so we get the original artist's lyrics
-        #             normal songs — search title + artist for precision
-        if is_cover:
-            song = self._search(clean_title, None)
+        key = _cache_key(clean_title, clean_artist, is_cover)
+        hit, cached = self.cache.get(key) if self.cache else (False, None)
+        if hit:
+            song = CachedSong(**cached) if cached else None
         else:
-            song = self._search(clean_title, clean_artist)
+            if not self.genius:
+                return None, f"{YELLOW}⚠  Lyrics unavailable — Genius client not available{RESET}"
+            failures = []
+            song = self._find(clean_title, clean_artist, user_query, is_cover, failures)
+            # A miss is only remembered when every request got an answer
+            if self.cache and (song or not failures):
+                self.cache.set(
+                    key,
+                    {"title": song.title, "artist": song.artist,
+                     "lyrics": song.lyrics} if song else None,
+                    ttl=HIT_TTL if song else MISS_TTL,
+                )
 
-        # Strategy 2: title only (for normal songs that failed artist+title)
-        if not song and not is_cover:
-            song = self._search(clean_title, None)
+        if song:
+            return song, f"{DIM}   Lyrics: \"{song.title}\" by {song.artist}{RESET}"
+
+        return None, f"{YELLOW}⚠  Lyrics not found for \"{clean_title}\"{RESET}"
 
+    def _strategies(self, clean_title: str, clean_artist: str, user_query: str,
+                    is_cover: bool, failures: list, cancelled: threading.Event) -> list:
+        """The Genius search strategies for one song, highest priority
+        first, as callables returning a song or None."""
+        searches = []
+        # Strategy 1: covers — search title only so we get the original artist's lyrics
+        #             normal songs — search title + artist for precision
+        searches.append((clean_title, None if is_cover else clean_artist))
+        # Strategy 2: title only (for normal songs that failed artist+title)
+        if not is_cover:
+            searches.append((clean_title, None))
         # Strategy 3: user query as last resort
-        if not song and user_query and user_query.strip():
-            song = self._search(user_query.strip(), None)
+        if user_query and user_query.strip():
+            searches.append((user_query.strip(), None))
+
+        strategies = []
+        for query in dict.fromkeys(searches):  # same request only once
+            strategies.append(lambda q=query: None if cancelled.is_set()
+                              else self._search(*q, failures))
 
         # Strategy 4: walk artist's song list on Genius (skip for covers)
-        if not song and not is_cover and clean_artist and \
+        if not is_cover and clean_artist and \
                 clean_artist.lower() not in ("unknown artist", "na", ""):
+            strategies.append(lambda: self._artist_walk(
+                clean_title, clean_artist, user_query, failures, cancelled))
+        return strategies
+
+    def _artist_walk(self, clean_title: str, clean_artist: str, user_query: str,
+                     failures: list, cancelled: threading.Event):
+        for song_id, title in self._artist_catalog(clean_artist, failures):
+            if cancelled.is_set():
+                return None
+            if _titles_match(title, clean_title) or _titles_match(title, user_query):
+                song = self._search(title, clean_artist, failures, song_id=song_id)
+                if song:
+                    return song
+        return None
+
+    def _artist_catalog(self, clean_artist: str, failures: list) -> list:
+        """[[song_id, title], ...] of the artist's most popular songs."""
+        key = _normalize(clean_artist)
+        hit, catalog = self.artist_cache.get(key) if self.artist_cache else (False, None)
+        if hit:
+            return catalog or []
+
+        # Songs of the same artist queued together wait for one fetch
+        with self._catalog_locks_lock:
+            lock = self._catalog_locks.setdefault(key, threading.Lock())
+        with lock:
+            if self.artist_cache:
+                hit, catalog = self.artist_cache.get(key)
+                if hit:
+                    return catalog or []
             try:
-                genius_artist = self.genius.search_artist(
-                    clean_artist, max_songs=10, sort="popularity"
+                catalog = self._fetch_catalog(clean_artist)
+            except Exception as e:
+                failures.append(e)
+                return []
+            if self.artist_cache:
+                self.artist_cache.set(
+                    key, catalog, ttl=CATALOG_TTL if catalog else CATALOG_MISS_TTL
                 )
-                if genius_artist:
-                    for s in genius_artist.songs:
-                        if _titles_match(s.title, clean_title) or \
-                           _titles_match(s.title, user_query):
-                            song = self._search(s.title, clean_artist)
-                            if song:
-                                break
-            except Exception:
-                pass
+            return catalog or []
 
-        if song:
-            return song, f"{DIM}   Lyrics: \"{song.title}\" by {song.artist}{RESET}"
+    def _fetch_catalog(self, clean_artist: str) -> list | None:
+        response = self.genius.search_artists(clean_artist, per_page=5)
+        artists = [
+            hit["result"]
+            for section in response.get("sections", []) if section.get("type") == "artist"
+            for hit in section.get("hits", []) if hit.get("result", {}).get("id")
+        ]
+        if not artists:
+            return None
+        # An exact name match, else Genius' most relevant artist
+        wanted = _normalize(clean_artist)
+        artist = next((a for a in artists if _normalize(a.get("name", "")) == wanted),
+                      artists[0])
 
-        return None, f"{YELLOW}⚠  Lyrics not found for \"{clean_title}\"{RESET}"
+        page = self.genius.artist_songs(artist["id"], per_page=CATALOG_SONGS,
+                                        sort="popularity")
+        return [[song["id"], song["title"]]
+                for song in page.get("songs", []) if song.get("id") and song.get("title")]
+
+    def _find(self, clean_title: str, clean_artist: str, user_query: str,
+              is_cover: bool, failures: list):
+        """Run the Genius search strategies, hedged: the first one starts
+        right away, and every HEDGE_DELAY seconds without an answer (or as
+        soon as a strategy misses) the next one starts too, up to
+        `concurrency` at a time. The highest-priority hit wins as soon as
+        every strategy above it has missed; the rest are abandoned.
+        Requests that failed are appended to `failures`."""
+        cancelled = threading.Event()
+        strategies = self._strategies(clean_title, clean_artist, user_query,
+                                      is_cover, failures, cancelled)
+        if self.concurrency <= 1:
+            for strategy in strategies:
+                song = strategy()
+                if song:
+                    return song
+            return None
+
+        pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        started = []
+        try:
+            for i in range(len(strategies)):
+                while True:
+                    while len(started) <= i:
+                        started.append(pool.submit(strategies[len(started)]))
+                    hedge = len(started) < len(strategies)
+                    try:
+                        song = started[i].result(timeout=HEDGE_DELAY if hedge else None)
+                        break
+                    except FuturesTimeout:
+                        # Still waiting on strategy i: start the next one too
+                        started.append(pool.submit(strategies[len(started)]))
+                if song:
+                    return song
+                # A miss frees a slot: start the next strategy without waiting
+                if len(started) < len(strategies):
+                    started.append(pool.submit(strategies[len(started)]))
+            return None
+        finally:
+            # Queued strategies never start; running ones stop before their
+            # next request and their results are dropped
+            cancelled.set()
+            pool.shutdown(wait=False, cancel_futures=True)
 
     def embed_lyrics(self, file_path: str, song, audio_format: str = "m4a") -> LyricsResult:
         """Embed a previously fetched song's lyrics into the audio file."""
@@ -135,15 +322,19 @@ class LyricsManager:
             return LyricsResult(status_msg)
         return LyricsResult(status_msg)
 
-    def _search(self, title: str, artist: str | None):
+    def _search(self, title: str, artist: str | None, failures: list | None = None,
+                song_id: int | None = None):
         try:
-            song = self.genius.search_song(title, artist or "")
+            song = self.genius.search_song(title, artist or "", song_id=song_id)
             if song and song.lyrics:
                 return song
         except Exception as e:
+            if failures is not None:
+                failures.append(e)
             err = str(e)
             if "401" in err:
                 print(f"{RED}❌ [E06] Genius token expired — run muse-cli --config{RESET}")
-            elif "429" in err:
+            elif ratelimit.http_status(e) in (429, 503):
+                # Still throttled after the session's retries
                 print(f"{YELLOW}⚠  [E07] Genius rate limit — wait a moment and retry{RESET}")
         return None
\ No newline at end of file
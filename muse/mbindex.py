@@ -0,0 +1,358 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+import re
+import tarfile
+import time
+import zlib
+
+from .db import Database
+from .colors import CYAN, GREEN, YELLOW, RED, DIM, RESET
+
+# Local MusicBrainz index for offline metadata lookups.
+#
+# `muse-cli --import-mb release.tar.xz` streams the release entity of a
+# MusicBrainz JSON dump (https://data.metabrainz.org/pub/musicbrainz/data/json-dumps/)
+# into ~/.config/muse-cli/musicbrainz.db, keeping only what the matcher
+# looks at: recording titles and artist credits, release titles and dates,
+# and release-group types. Recording titles and artists go into an FTS5
+# table, so a lookup is a couple of indexed queries instead of a rate-limited
+# web request.
+#
+# The dump is read line by line and written in batches, so memory stays flat
+# whatever its size. Every release keeps a checksum of its dump line:
+# importing a newer dump only rewrites releases that changed, and releases
+# it no longer contains are deleted afterwards, together with recordings
+# left without a release.
+#
+# Results are returned in the shape of musicbrainzngs.search_recordings, so
+# metadata._pick_best_recording scores them exactly like web results.
+
+BATCH_SIZE = 500         # releases per write transaction
+SEARCH_LIMIT = 50        # candidate recordings per lookup
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id     INTEGER PRIMARY KEY,
+    mbid   TEXT NOT NULL UNIQUE,
+    title  TEXT NOT NULL,
+    artist TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS recording_search USING fts5(
+    title, artist,
+    content='recordings', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS release_groups (
+    mbid      TEXT PRIMARY KEY,
+    type      TEXT NOT NULL,
+    secondary TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS releases (
+    mbid          TEXT PRIMARY KEY,
+    title         TEXT NOT NULL,
+    date          TEXT NOT NULL,
+    release_group TEXT,
+    checksum      INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tracks (
+    release   TEXT NOT NULL,
+    recording INTEGER NOT NULL,
+    PRIMARY KEY (release, recording)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tracks_recording ON tracks(recording);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS seen_releases (
+    mbid TEXT PRIMARY KEY
+) WITHOUT ROWID
+"""
+
+
+# ── MusicBrainz JSON → musicbrainzngs shape ──────────────────────────────────
+
+def credit_phrase(credits: list) -> str:
+    """'Artist A feat. Artist B' from a JSON artist-credit list."""
+    return "".join(
+        (c.get("name") or c.get("artist", {}).get("name", "")) + (c.get("joinphrase") or "")
+        for c in credits or []
+    ).strip()
+
+
+def release_group_from_json(rg: dict) -> dict:
+    return {
+        "id": rg.get("id", ""),
+        "type": rg.get("primary-type") or "",
+        "secondary-type-list": list(rg.get("secondary-types") or []),
+    }
+
+
+def release_from_json(rel: dict) -> dict:
+    return {
+        "id": rel.get("id", ""),
+        "title": rel.get("title") or "",
+        "date": rel.get("date") or "",
+        "release-group": release_group_from_json(rel.get("release-group") or {}),
+    }
+
+
+def recording_from_json(rec: dict) -> dict:
+    """A recording from the MusicBrainz JSON API or dumps, shaped like the
+    entries of musicbrainzngs.search_recordings()['recording-list']."""
+    return {
+        "id": rec.get("id", ""),
+        "title": rec.get("title") or "",
+        "artist-credit-phrase": credit_phrase(rec.get("artist-credit")),
+        "release-list": [release_from_json(r) for r in rec.get("releases") or []],
+    }
+
+
+# ── Reading dumps ────────────────────────────────────────────────────────────
+
+def _open_lines(path: str):
+    """Yield the lines of a JSON dump: the `mbdump/release` member of a dump
+    archive, or a (possibly compressed) file with one release per line."""
+    name = path.lower()
+    if name.endswith((".tar", ".tar.xz", ".tar.gz", ".tgz", ".tar.bz2")):
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and os.path.basename(member.name) == "release":
+                    yield from archive.extractfile(member)
+                    return
+        raise Exception(f"[E08] No mbdump/release file in {path}")
+
+    opener = {".xz": lzma.open, ".gz": gzip.open, ".bz2": bz2.open}.get(
+        os.path.splitext(name)[1], open
+    )
+    with opener(path, "rb") as f:
+        yield from f
+
+
+# ── Index ────────────────────────────────────────────────────────────────────
+
+def _fts_terms(text: str) -> str:
+    words = re.findall(r"\w+", text.lower())
+    return " OR ".join(f'"{w}"' for w in words)
+
+
+class LocalIndex:
+    """SQLite index of a MusicBrainz dump.
+
+    Usage:
+        index = LocalIndex(path)
+        index.import_dump("release.tar.xz")
+        recordings = index.search(artist, title, is_cover)
+    """
+
+    def __init__(self, path: str):
+        self.db = Database(path, _SCHEMA)
+
+    def is_empty(self) -> bool:
+        return self.db.execute("SELECT 1 FROM releases LIMIT 1").fetchone() is None
+
+    # ── Lookups ──────────────────────────────────────────────────────────────
+
+    def search(self, artist: str, title: str, is_cover: bool = False,
+               limit: int = SEARCH_LIMIT) -> list:
+        """Candidate recordings for a title (and artist, unless looking up a
+        cover), best text matches first."""
+        query = _fts_terms(title)
+        if not query:
+            return []
+        query = f"title : ({query})"
+        artist_terms = _fts_terms(artist)
+        if artist_terms and not is_cover:
+            query += f" AND artist : ({artist_terms})"
+
+        rows = self.db.execute(
+            "SELECT r.id, r.mbid, r.title, r.artist FROM recording_search "
+            "JOIN recordings r ON r.id = recording_search.rowid "
+            "WHERE recording_search MATCH ? ORDER BY rank LIMIT ?",
+            (query, limit),
+        ).fetchall()
+        if not rows:
+            return []
+
+        recordings = {
+            rid: {"id": mbid, "title": rec_title, "artist-credit-phrase": rec_artist,
+                  "release-list": []}
+            for rid, mbid, rec_title, rec_artist in rows
+        }
+        marks = ",".join("?" * len(recordings))
+        for rid, mbid, rel_title, date, rg_id, rg_type, secondary in self.db.execute(
+            "SELECT t.recording, r.mbid, r.title, r.date, g.mbid, g.type, g.secondary "
+            "FROM tracks t JOIN releases r ON r.mbid = t.release "
+            "LEFT JOIN release_groups g ON g.mbid = r.release_group "
+            f"WHERE t.recording IN ({marks})",
+            list(recordings),
+        ):
+            recordings[rid]["release-list"].append({
+                "id": mbid, "title": rel_title, "date": date,
+                "release-group": {
+                    "id": rg_id or "", "type": rg_type or "",
+                    "secondary-type-list": secondary.split(";") if secondary else [],
+                },
+            })
+        return list(recordings.values())
+
+    # ── Import ───────────────────────────────────────────────────────────────
+
+    def _recording_id(self, conn, mbid: str, title: str, artist: str) -> int:
+        row = conn.execute(
+            "SELECT id, title, artist FROM recordings WHERE mbid = ?", (mbid,)
+        ).fetchone()
+        if row is None:
+            rid = conn.execute(
+                "INSERT INTO recordings (mbid, title, artist) VALUES (?, ?, ?)",
+                (mbid, title, artist),
+            ).lastrowid
+        else:
+            rid = row[0]
+            if row[1:] == (title, artist):
+                return rid
+            # External-content FTS: remove the old text before changing it
+            conn.execute(
+                "INSERT INTO recording_search (recording_search, rowid, title, artist) "
+                "VALUES ('delete', ?, ?, ?)", row,
+            )
+            conn.execute(
+                "UPDATE recordings SET title = ?, artist = ? WHERE id = ?",
+                (title, artist, rid),
+            )
+        conn.execute(
+            "INSERT INTO recording_search (rowid, title, artist) VALUES (?, ?, ?)",
+            (rid, title, artist),
+        )
+        return rid
+
+    def _store_release(self, conn, rel: dict, checksum: int):
+        rg = release_group_from_json(rel.get("release-group") or {})
+        if rg["id"]:
+            conn.execute(
+                "INSERT OR REPLACE INTO release_groups VALUES (?, ?, ?)",
+                (rg["id"], rg["type"], ";".join(rg["secondary-type-list"])),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO releases VALUES (?, ?, ?, ?, ?)",
+            (rel["id"], rel.get("title") or "", rel.get("date") or "",
+             rg["id"] or None, checksum),
+        )
+        conn.execute("DELETE FROM tracks WHERE release = ?", (rel["id"],))
+        for medium in rel.get("media") or []:
+            for track in medium.get("tracks") or []:
+                rec = track.get("recording") or {}
+                if not rec.get("id"):
+                    continue
+                rid = self._recording_id(
+                    conn, rec["id"], rec.get("title") or track.get("title") or "",
+                    credit_phrase(rec.get("artist-credit") or track.get("artist-credit")),
+                )
+                conn.execute("INSERT OR IGNORE INTO tracks VALUES (?, ?)",
+                             (rel["id"], rid))
+
+    def _write_batch(self, batch: list) -> int:
+        """Store the releases of `batch` that are new or changed."""
+        written = 0
+        with self.db.transaction() as conn:
+            for line, checksum in batch:
+                try:
+                    rel = json.loads(line)
+                except ValueError:
+                    continue
+                if not rel.get("id"):
+                    continue
+                conn.execute("INSERT OR IGNORE INTO seen_releases VALUES (?)", (rel["id"],))
+                row = conn.execute(
+                    "SELECT checksum FROM releases WHERE mbid = ?", (rel["id"],)
+                ).fetchone()
+                if row and row[0] == checksum:
+                    continue
+                self._store_release(conn, rel, checksum)
+                written += 1
+        return written
+
+    def import_dump(self, path: str) -> dict:
+        """Import or update from a MusicBrainz JSON dump of releases."""
+        seen = written = 0
+        batch = []
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM seen_releases")   # left by an aborted import
+        for line in _open_lines(path):
+            if not line.strip():
+                continue
+            # Unchanged releases are recognised without parsing the JSON
+            batch.append((line, zlib.crc32(line)))
+            if len(batch) >= BATCH_SIZE:
+                written += self._write_batch(batch)
+                seen += len(batch)
+                batch = []
+                print(f"\r{DIM}   {seen:,} releases read, {written:,} written{RESET}",
+                      end="", flush=True)
+        if batch:
+            written += self._write_batch(batch)
+            seen += len(batch)
+        removed = self._remove_unseen()
+
+        with self.db.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)",
+                         (os.path.basename(path),))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('imported_at', ?)",
+                         (str(int(time.time())),))
+        if written or removed:
+            self.db.execute("INSERT INTO recording_search (recording_search) VALUES ('optimize')")
+        return {"releases": seen, "written": written, "removed": removed}
+
+    def _remove_unseen(self) -> int:
+        """Delete releases the imported dump didn't contain, and recordings
+        no release refers to any more (also those dropped from a changed
+        release). Returns the number of releases removed."""
+        with self.db.transaction() as conn:
+            stale = [(mbid,) for (mbid,) in conn.execute(
+                "SELECT mbid FROM releases WHERE mbid NOT IN (SELECT mbid FROM seen_releases)"
+            )]
+            conn.executemany("DELETE FROM tracks WHERE release = ?", stale)
+            conn.executemany("DELETE FROM releases WHERE mbid = ?", stale)
+            conn.execute(
+                "DELETE FROM release_groups WHERE mbid NOT IN "
+                "(SELECT release_group FROM releases WHERE release_group IS NOT NULL)"
+            )
+            orphans = conn.execute(
+                "SELECT id, title, artist FROM recordings "
+                "WHERE id NOT IN (SELECT recording FROM tracks)"
+            ).fetchall()
+            # External-content FTS: remove the text before the row
+            conn.executemany(
+                "INSERT INTO recording_search (recording_search, rowid, title, artist) "
+                "VALUES ('delete', ?, ?, ?)", orphans,
+            )
+            conn.executemany("DELETE FROM recordings WHERE id = ?",
+                             [(rid,) for rid, _, _ in orphans])
+            conn.execute("DELETE FROM seen_releases")
+        return len(stale)
+
+
+def import_dump(dump_path: str, index_path: str):
+    """`muse-cli --import-mb DUMP`: build or update the local index."""
+    if not os.path.exists(dump_path):
+        print(f"{YELLOW}⚠  {dump_path} not found{RESET}")
+        return
+    print(f"{CYAN}📥 Importing {dump_path} into {index_path}...{RESET}")
+    start = time.monotonic()
+    index = LocalIndex(index_path)
+    try:
+        stats = index.import_dump(dump_path)
+    except Exception as e:
+        print(f"\n{RED}❌ Import failed: {e}{RESET}")
+        return
+    elapsed = max(time.monotonic() - start, 1e-6)
+    recordings = index.db.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+    print(f"\r{GREEN}✅ {stats['releases']:,} releases read in {elapsed:.0f}s — "
+          f"{stats['written']:,} new or changed, "
+          f"{stats['releases'] - stats['written']:,} unchanged, "
+          f"{stats['removed']:,} removed{RESET}")
+    print(f"{DIM}   {recordings:,} recordings indexed{RESET}")
+    print(f"{DIM}   Set \"metadata_backend\": \"local\" in config.json to use it{RESET}")
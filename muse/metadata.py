@@ -1,16 +1,21 @@
+import os
 import re
-import time
-import threading
+import json
 
+from .cache import DiskCache, DAY
 from .colors import DIM, RESET
 
 _SECONDARY_REJECT = {"Live", "Compilation", "Remix", "DJ-mix", "Mixtape/Street",
                       "Demo", "Soundtrack", "Spokenword", "Interview", "Audiobook"}
 
-_last_request_time = 0.0
 
-# Lock to guard read-modify-write on `_last_request_time` for safe concurrency
-_last_request_lock = threading.Lock()
+# Release titles containing these are not the original studio album
+_NON_STUDIO_WORDS = [
+    'reissue', 'remaster', 'compilation', 'mix', 'commentary',
+    'live', 'concert', 'festival', 'bootleg', 'tour', 'unplugged',
+    'deluxe', 'anniversary', 'promo', 'unmastered', 'advance',
+    'sampler', 'demo', 'bonus',
+]
 
 
 def _normalize(text: str) -> str:
@@ -52,12 +57,7 @@ def _release_score(rel: dict) -> tuple:
 
     # Penalize titles that suggest non-studio releases
     title = rel.get('title', '').lower()
-    title_penalty = 1 if any(w in title for w in [
-        'reissue', 'remaster', 'compilation', 'mix', 'commentary',
-        'live', 'concert', 'festival', 'bootleg', 'tour', 'unplugged',
-        'deluxe', 'anniversary', 'promo', 'unmastered', 'advance',
-        'sampler', 'demo', 'bonus',
-    ]) else 0
+    title_penalty = 1 if any(w in title for w in _NON_STUDIO_WORDS) else 0
 
     # Prefer releases with dates, and prefer earlier dates (original release)
     date = rel.get('date', '')
@@ -139,53 +139,182 @@ def _pick_best_recording(recordings: list, title: str, artist: str,
     return best_result or {}
 
 
-def lookup_metadata(artist: str, title: str, is_cover: bool = False) -> dict:
+# ── YouTube Music fields ──────────────────────────────────────────────────────
+#
+# Uploads from "- Topic" channels (and other label uploads) come with the
+# track, album, artist and release year YouTube Music knows about. When
+# those are complete and agree with the upload they are used as-is and
+# MusicBrainz is not asked at all.
+
+# "Song - Remastered 2011", "Song (2009 Remaster)"
+_REMASTER_SUFFIX = re.compile(
+    r'\s*[-–(\[]\s*(?:\d{4}\s+)?(?:digital(?:ly)?\s+)?remaster(?:ed)?'
+    r'(?:\s+(?:version|\d{4}))*\s*[)\]]?\s*$',
+    re.IGNORECASE,
+)
+
+
+def _info_field(info: dict, name: str) -> str:
+    value = info.get(name)
+    if value is None:
+        return ''
+    value = str(value).strip()
+    return '' if value.lower() in ('na', 'none') else value
+
+
+def metadata_from_info(info: dict | None, title: str, is_cover: bool = False) -> dict:
+    """
+    Take artist/title/album/year from the YouTube Music fields of a yt-dlp
+    info record. Returns {} when a field is missing or the fields look
+    inconsistent with the upload (`title` is the title parsed from it),
+    so the caller falls back to MusicBrainz.
+    """
+    if not info or is_cover:
+        # Covers are tagged with the original recording's album
+        return {}
+    track  = _info_field(info, 'track')
+    album  = _info_field(info, 'album')
+    artist = _info_field(info, 'artist') or _info_field(info, 'creator')
+    year   = _info_field(info, 'release_year') or _info_field(info, 'release_date')[:4]
+    if not (track and album and artist and len(year) == 4 and year.isdigit()):
+        return {}
+
+    # The track has to be the song the upload is titled as
+    track = _REMASTER_SUFFIX.sub('', track) or track
+    if _title_score(track, _REMASTER_SUFFIX.sub('', title) or title) < 0.6:
+        return {}
+
+    # Topic channels are named after the artist
+    channel = _info_field(info, 'channel') or _info_field(info, 'uploader')
+    if re.search(r'\s-\sTopic$', channel, flags=re.IGNORECASE):
+        channel = re.sub(r'\s-\sTopic$', '', channel, flags=re.IGNORECASE)
+        if not _artist_matches(artist, channel):
+            return {}
+
+    # Compilations, live albums and reissues carry the wrong album and
+    # year; MusicBrainz finds the original release
+    if any(w in album.lower() for w in _NON_STUDIO_WORDS):
+        return {}
+
+    return {'artist': artist, 'title': track, 'album': album, 'year': year}
+
+
+MB_SEARCH_URL = "https://musicbrainz.org/ws/2/recording"
+MB_TIMEOUT = 15
+
+# Characters with a meaning in Lucene queries
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]\^"~*?:\\/])')
+
+
+def _lucene(value: str) -> str:
+    # Lowercase so words like AND / OR aren't read as operators
+    return _LUCENE_SPECIAL.sub(r'\\\1', value).lower()
+
+
+def _search_recordings(artist: str, title: str, is_cover: bool) -> list | None:
+    """Raw MusicBrainz recording search through the JSON web service, in
+    musicbrainzngs' shape; None when the request failed. Rate limiting and
+    retries are handled by the shared session."""
+    from .sessions import session
+    from .mbindex import recording_from_json
+
+    fields = [("recording", title)] if is_cover else [("recording", title), ("artist", artist)]
+    query = " ".join(f"{key}:({_lucene(value)})" for key, value in fields if value)
+    if not query:
+        return None
+    try:
+        response = session("musicbrainz").get(
+            MB_SEARCH_URL,
+            params={"query": query, "limit": 10 if is_cover else 50, "fmt": "json"},
+            timeout=MB_TIMEOUT,
+        )
+        response.raise_for_status()
+        return [recording_from_json(r) for r in response.json().get("recordings", [])]
+    except Exception:
+        return None
+
+
+# ── Response cache ────────────────────────────────────────────────────────────
+#
+# Raw recording lists are cached on disk (not the picked match), so changes
+# to the scoring apply to cached songs too. Queries that produced no match
+# are cached for a shorter time, since MusicBrainz may gain the release.
+
+HIT_TTL  = 30 * DAY
+MISS_TTL = 1 * DAY
+
+_cache = None
+
+
+def configure_cache(path: str, max_bytes: int = 128 << 20):
+    """Enable the MusicBrainz response cache (called once at startup)."""
+    global _cache
+    _cache = DiskCache(path, "musicbrainz", max_bytes=max_bytes)
+
+
+def _cache_key(artist: str, title: str, is_cover: bool) -> str:
+    # Cover lookups search by title only, so the artist is not part of the key
+    artist = "" if is_cover else " ".join(_normalize(artist).split())
+    return json.dumps([artist, " ".join(_normalize(title).split()), is_cover])
+
+
+# ── Local index ───────────────────────────────────────────────────────────────
+#
+# With "metadata_backend": "local" lookups are answered from an imported
+# MusicBrainz dump (see mbindex.py) first; only songs the index has no match
+# for go to the web service.
+
+_index = None
+
+
+def configure_index(path: str) -> bool:
+    """Use the local MusicBrainz index at `path`; False if it is missing."""
+    global _index
+    if not os.path.exists(path):
+        return False
+    from .mbindex import LocalIndex
+    _index = LocalIndex(path)
+    return True
+
+
+def _lookup_local(artist: str, title: str, is_cover: bool) -> dict:
+    try:
+        recordings = _index.search(artist, title, is_cover)
+    except Exception:
+        return {}
+    return _pick_best_recording(recordings, title, artist, is_cover)
+
+
+def lookup_metadata(artist: str, title: str, is_cover: bool = False,
+                    info: dict | None = None) -> dict:
     """
     Query MusicBrainz for metadata.
     If is_cover=True, search by title only and take the most popular result
     so covers correctly return the original artist's album info.
+    With the upload's yt-dlp `info`, complete YouTube Music fields are used
+    instead of querying MusicBrainz.
     Returns { 'artist', 'title', 'album', 'year' } or empty dict.
     """
+    match = metadata_from_info(info, title, is_cover)
+    if match:
+        return match
+
+    if _index is not None:
+        match = _lookup_local(artist, title, is_cover)
+        if match:
+            return match
+
     try:
-        import musicbrainzngs
-        musicbrainzngs.set_useragent(
-            'muse-cli', '1.0', 'https://github.com/Ulasti/muse-cli'
-        )
-        global _last_request_time
-        # Atomically enforce the 1s spacing between requests: read last
-        # request time, sleep if needed, then perform the request and
-        # update the timestamp while holding the same lock to prevent
-        # races with other threads.
-        for attempt in range(2):
-            try:
-                with _last_request_lock:
-                    elapsed = time.monotonic() - _last_request_time
-                    if elapsed < 1.0:
-                        time.sleep(1.0 - elapsed)
-
-                    # Perform the network call while holding the lock so
-                    # the post-request timestamp update is atomic with the
-                    # earlier sleep calculation.
-                    if is_cover:
-                        result = musicbrainzngs.search_recordings(
-                            recording=title, limit=10
-                        )
-                    else:
-                        result = musicbrainzngs.search_recordings(
-                            artist=artist, recording=title, limit=50
-                        )
-
-                    _last_request_time = time.monotonic()
-
-                break
-            except Exception:
-                if attempt == 0:
-                    time.sleep(2)
-                    continue
+        key = _cache_key(artist, title, is_cover)
+        hit, recordings = _cache.get(key) if _cache else (False, None)
+        if not hit:
+            recordings = _search_recordings(artist, title, is_cover)
+            if recordings is None:
                 return {}
 
-        recordings = result.get('recording-list', [])
         match = _pick_best_recording(recordings, title, artist, is_cover)
+        if _cache and not hit:
+            _cache.set(key, recordings, ttl=HIT_TTL if match else MISS_TTL)
         if match:
             return match
 
@@ -194,4 +323,4 @@ def lookup_metadata(artist: str, title: str, is_cover: bool = False) -> dict:
     except Exception:
         pass
 
-    return {}
\ No newline at end of file
+    return {}
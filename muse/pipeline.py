@@ -0,0 +1,286 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .search import search_youtube, BulkSearch
+from .downloader import (
+    new_job, resolve_stage, metadata_stage, download_stage, hash_stage,
+    finalize_stage, apply_prefetched,
+)
+from .prefetch import Prefetcher, DEFAULT_LOOKAHEAD
+
+# Default worker count per stage. The download stage is sized by the
+# `jobs` setting; the other stages are cheap or rate limited.
+DEFAULT_STAGE_WORKERS = {"resolve": 1, "metadata": 1, "download": 1, "finalize": 1}
+
+_STOP = object()
+
+
+class Stage:
+    """One step of the pipeline: a worker pool fed by its own queue.
+
+    `func(job, report)` returns True to hand the job to the next stage or
+    False when the job is finished early (skipped, failed, ...).
+    """
+
+    def __init__(self, name: str, func, workers: int = 1, maxsize: int = 0):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize)
+        self.threads = []
+        self.live = 0
+
+
+class Pipeline:
+    """Runs jobs through a chain of stages so consecutive jobs overlap.
+
+    Every stage after the first has a bounded queue, so a fast stage blocks
+    once it is far enough ahead of a slow one and throughput is set by the
+    slowest stage rather than the sum of all of them.
+
+    Each worker thread owns a status slot (0..worker_count-1);
+    `on_status(slot, stage, detail)` receives its progress reports and
+    `on_finished(job, ok)` is called once per job when it leaves the pipeline.
+    """
+
+    def __init__(self, stages: list, on_status=None, on_finished=None):
+        self.stages = stages
+        self.on_status = on_status
+        self.on_finished = on_finished
+        self.slot_labels = []
+        self._pending = 0
+        self._cond = threading.Condition()
+
+        for index, stage in enumerate(stages):
+            stage.live = stage.workers
+            for n in range(stage.workers):
+                slot = len(self.slot_labels)
+                label = stage.name if stage.workers == 1 else f"{stage.name} {n + 1}"
+                self.slot_labels.append(label)
+                t = threading.Thread(
+                    target=self._run, args=(index, slot), daemon=True
+                )
+                stage.threads.append(t)
+
+    @property
+    def worker_count(self) -> int:
+        return len(self.slot_labels)
+
+    def start(self):
+        for stage in self.stages:
+            for t in stage.threads:
+                t.start()
+
+    # ── Submitting / waiting ─────────────────────────────────────────────────
+
+    def put(self, job):
+        """Queue a job at the first stage (never blocks)."""
+        with self._cond:
+            self._pending += 1
+        self.stages[0].queue.put(job)
+
+    def qsize(self) -> int:
+        """Jobs waiting for the first stage."""
+        return self.stages[0].queue.qsize()
+
+    def pending(self) -> int:
+        """Jobs queued or in flight anywhere in the pipeline."""
+        with self._cond:
+            return self._pending
+
+    def wait_idle(self):
+        """Block until every submitted job has left the pipeline."""
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+
+    def drain(self):
+        """Drop jobs that have not started yet; in-flight jobs keep going."""
+        first = self.stages[0].queue
+        while True:
+            try:
+                job = first.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                first.put(job)
+                break
+            self._finish(job, False, notify=False)
+
+    def close(self):
+        """Stop all workers once the queued jobs have been processed."""
+        for _ in range(self.stages[0].workers):
+            self.stages[0].queue.put(_STOP)
+        for stage in self.stages:
+            for t in stage.threads:
+                t.join()
+
+    # ── Workers ──────────────────────────────────────────────────────────────
+
+    def _report(self, slot, stage, detail):
+        if self.on_status:
+            self.on_status(slot, stage, detail)
+
+    def _finish(self, job, ok, notify=True):
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+        if notify and self.on_finished:
+            self.on_finished(job, ok)
+
+    def _run(self, index, slot):
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+
+        def report(kind, detail):
+            self._report(slot, kind, detail)
+
+        while True:
+            job = stage.queue.get()
+            if job is _STOP:
+                break
+            try:
+                ok = stage.func(job, report)
+            except Exception as e:
+                label = job.get("final_title") or job.get("title") or job.get("entry", "")
+                report("error", f"{label} · {e}" if label else str(e))
+                ok = False
+
+            if ok and not is_last:
+                self.stages[index + 1].queue.put(job)
+            else:
+                self._finish(job, ok and is_last)
+
+        # The last worker of a stage to stop passes the stop on, after every
+        # other worker of this stage has forwarded its final job.
+        with self._cond:
+            stage.live -= 1
+            last_out = stage.live == 0
+        if last_out and not is_last:
+            nxt = self.stages[index + 1]
+            for _ in range(nxt.workers):
+                nxt.queue.put(_STOP)
+
+
+class SongPipeline(Pipeline):
+    """resolve → metadata → download → finalize for interactive queue items.
+
+    Jobs are queue items ({"entry", "user_query"}, optionally "info"); the
+    entry is either a URL or a search query. An "info" record from an earlier
+    search lets the resolve stage skip yt-dlp entirely.
+    """
+
+    def __init__(self, config, duplicate_checker, lyrics_manager,
+                 stage_workers=None, on_status=None, on_finished=None):
+        self.config = config
+        self.duplicate_checker = duplicate_checker
+        self.lyrics_manager = lyrics_manager
+        self._bulk = {}             # query -> BulkSearch resolving it
+        self._bulk_lock = threading.Lock()
+        # Enriches the next few queued entries while earlier songs download
+        lookahead = config.get("prefetch", DEFAULT_LOOKAHEAD)
+        self.prefetcher = (Prefetcher(duplicate_checker, lyrics_manager, lookahead,
+                                      search=self._search)
+                           if lookahead else None)
+
+        workers = dict(DEFAULT_STAGE_WORKERS)
+        workers.update(config.get("stage_workers") or {})
+        workers.update(stage_workers or {})
+        # Lyrics and cover fetches started by the metadata stage
+        self._lyrics_executor = ThreadPoolExecutor(
+            max_workers=2 * max(1, workers["metadata"])
+        )
+
+        stages = [
+            Stage("resolve", self._resolve, workers["resolve"]),
+            Stage("metadata", self._metadata, workers["metadata"],
+                  maxsize=2 * workers["metadata"]),
+            Stage("download", self._download, workers["download"],
+                  maxsize=2 * workers["download"]),
+            Stage("finalize", self._finalize, workers["finalize"],
+                  maxsize=2 * workers["finalize"]),
+        ]
+        super().__init__(stages, on_status=on_status, on_finished=on_finished)
+
+    def put(self, job):
+        if self.prefetcher:
+            self.prefetcher.add(job["entry"], job["user_query"], job.get("info"))
+        super().put(job)
+
+    def put_many(self, jobs: list):
+        """Queue a batch; its search queries are resolved together in one
+        background yt-dlp run as the jobs wait."""
+        queries = [job["entry"] for job in jobs
+                   if not job["entry"].startswith(("http://", "https://", "www."))]
+        if queries:
+            bulk = BulkSearch(queries)
+            with self._bulk_lock:
+                self._bulk.update(dict.fromkeys(queries, bulk))
+        for job in jobs:
+            self.put(job)
+
+    def _search(self, entry: str, max_results: int = 1) -> list:
+        with self._bulk_lock:
+            bulk = self._bulk.get(entry)
+        return (bulk.search if bulk else search_youtube)(entry, max_results)
+
+    def drain(self):
+        super().drain()
+        with self._bulk_lock:
+            self._bulk.clear()
+        if self.prefetcher:
+            self.prefetcher.clear()
+
+    def close(self):
+        super().close()
+        self._lyrics_executor.shutdown(wait=True)
+        if self.prefetcher:
+            self.prefetcher.close()
+
+    def _resolve(self, job, report):
+        entry = job["entry"]
+        info = job.get("info")
+        with self._bulk_lock:
+            bulk = self._bulk.pop(entry, None)
+        pre = self.prefetcher.take(entry) if self.prefetcher else None
+        if pre and pre.get("url"):
+            url, info = pre["url"], pre.get("info") or info
+            if pre.get("search_result"):
+                report("found", f"{pre['search_result']['title']} · found")
+        elif entry.startswith(("http://", "https://", "www.")):
+            url = entry
+            if url.startswith("www."):
+                url = "https://" + url
+        else:
+            report("searching", f"searching: {entry}")
+            results = (bulk.search if bulk else search_youtube)(entry, max_results=1)
+            if not results:
+                report("error", f"{entry} · no results found")
+                return False
+            url = results[0]["url"]
+            info = results[0]["info"]
+            report("found", f"{results[0]['title']} · found")
+
+        job.update(new_job(
+            url, self.config["output_base"],
+            user_query=job["user_query"],
+            audio_format=self.config["audio_format"],
+            batch_mode=True,
+            info=info,
+        ))
+        apply_prefetched(job, pre)
+        return resolve_stage(job, self.duplicate_checker, report)
+
+    def _metadata(self, job, report):
+        return metadata_stage(job, self.lyrics_manager,
+                              self._lyrics_executor, report)
+
+    def _download(self, job, report):
+        # Hash on the download workers so the single finalize worker
+        # only tags and registers
+        return (download_stage(job, report)
+                and hash_stage(job, self.duplicate_checker))
+
+    def _finalize(self, job, report):
+        return finalize_stage(job, self.duplicate_checker, report)
@@ -0,0 +1,162 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .search import search_youtube
+from .engine import get_engine
+from .downloader import video_id_from_url, has_video_info, parse_video_info
+
+# Songs waiting in a queue are resolved ahead of time: search, video info,
+# MusicBrainz metadata and Genius lyrics for the next `lookahead` entries
+# run in the background (under the usual per-service rate limits) while
+# earlier songs download. When a song's turn comes its stages pick the
+# results up instead of making the calls themselves, so the remaining work
+# is mostly the download. A song is handed over as soon as it is resolved;
+# a metadata or lyrics lookup still in flight is waited for by the stage
+# that needs it, so a slow Genius or MusicBrainz answer never holds up the
+# resolve stage.
+
+DEFAULT_LOOKAHEAD = 4
+
+
+def _is_url(entry: str) -> bool:
+    return entry.startswith(("http://", "https://", "www."))
+
+
+class Prefetcher:
+    """Look-ahead enrichment for queued entries (search queries or URLs).
+
+    Usage:
+        prefetcher.add(entry, user_query)   # when the entry is queued
+        ...
+        pre = prefetcher.take(entry)        # when its turn comes
+        # pre: {"url", "info", "search_result", "mb", "lyrics"} (keys present
+        # only for the steps that ran), or None when nothing was prefetched.
+        # "mb" and "lyrics" are Futures: take() returns as soon as the song
+        # is resolved, and the later stages wait for the lookups still in
+        # flight. They resolve to None when a lookup failed.
+    """
+
+    def __init__(self, duplicate_checker, lyrics_manager,
+                 lookahead: int = DEFAULT_LOOKAHEAD, search=search_youtube):
+        self.duplicate_checker = duplicate_checker
+        self.lyrics_manager = lyrics_manager
+        self.search = search        # search_youtube, or a BulkSearch's search
+        self.lookahead = max(1, lookahead)
+        self._executor = ThreadPoolExecutor(max_workers=self.lookahead)
+        self._waiting = deque()     # (entry, user_query, info) not started yet
+        self._futures = {}          # entry -> (task, resolved) Futures, started
+        self._lock = threading.Lock()
+
+    def add(self, entry: str, user_query: str = "", info: dict | None = None):
+        with self._lock:
+            self._waiting.append((entry, user_query, info))
+            self._fill()
+
+    def take(self, entry: str) -> dict | None:
+        """Prefetched data for `entry`, waiting until it is resolved if it is
+        still being searched. Entries that were never started are forgotten."""
+        with self._lock:
+            futures = self._futures.pop(entry, None)
+            if futures is None:
+                for item in self._waiting:
+                    if item[0] == entry:
+                        self._waiting.remove(item)
+                        break
+            self._fill()
+        if futures is None:
+            return None
+        try:
+            return futures[1].result()
+        except Exception:
+            return None
+
+    def clear(self):
+        """Forget queued entries (in-flight fetches finish and are dropped)."""
+        with self._lock:
+            self._waiting.clear()
+            for task, _ in self._futures.values():
+                task.cancel()
+            self._futures.clear()
+
+    def close(self):
+        self.clear()
+        self._executor.shutdown(wait=True)
+
+    def _fill(self):
+        while self._waiting and len(self._futures) < self.lookahead:
+            entry, user_query, info = self._waiting.popleft()
+            if entry in self._futures:
+                continue
+            resolved = Future()
+            task = self._executor.submit(
+                self._enrich, entry, user_query, info, resolved
+            )
+            self._futures[entry] = (task, resolved)
+
+    def _known(self, video_id: str) -> bool:
+        return self.duplicate_checker.is_duplicate_by_id(video_id)[0]
+
+    def _resolve(self, entry: str, info: dict | None):
+        """(result, song): the search/extract result, and the parsed
+        (artist, title, is_cover, info) to look up, or None to stop there."""
+        result = {}
+        if _is_url(entry):
+            url = entry if not entry.startswith("www.") else "https://" + entry
+        else:
+            results = self.search(entry, max_results=1)
+            if not results:
+                return result, None
+            url, info = results[0]["url"], results[0]["info"]
+            result["search_result"] = results[0]
+        result["url"] = url
+
+        # Songs already in the library are skipped by the resolve stage;
+        # don't spend rate-limited lookups on them
+        url_id = video_id_from_url(url)
+        if url_id and self._known(url_id):
+            result["info"] = info
+            return result, None
+        if not has_video_info(info):
+            info = get_engine().extract_info(url)
+        result["info"] = info
+        artist, title, video_id, is_cover = parse_video_info(info)
+        if video_id != url_id and self._known(video_id):
+            return result, None
+        return result, (artist, title, is_cover, info)
+
+    def _enrich(self, entry: str, user_query: str, info: dict | None,
+                resolved: Future):
+        """Publish the resolved song on `resolved` first, then look up its
+        metadata and lyrics into the Futures it carries."""
+        try:
+            result, song = self._resolve(entry, info)
+        except Exception as e:
+            resolved.set_exception(e)
+            return
+        if song is None:
+            resolved.set_result(result)
+            return
+
+        mb, lyrics = Future(), Future()
+        result["mb"], result["lyrics"] = mb, lyrics
+        resolved.set_result(result)
+        try:
+            from .metadata import lookup_metadata
+            artist, title, is_cover, info = song
+            match = lookup_metadata(artist, title, is_cover=is_cover, info=info)
+            mb.set_result(match)
+            song_lyrics = None
+            if self.lyrics_manager is not None:
+                song_lyrics = self.lyrics_manager.fetch_lyrics(
+                    match.get("title") or title, match.get("artist") or artist,
+                    user_query=user_query, is_cover=is_cover,
+                )
+            lyrics.set_result(song_lyrics)
+        except Exception:
+            pass
+        finally:
+            # Stages waiting on a failed lookup fall back to their own
+            for future in (mb, lyrics):
+                if not future.done():
+                    future.set_result(None)
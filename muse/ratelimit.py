@@ -0,0 +1,173 @@
+import os
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from .db import Database
+
+# Token-bucket rate limits per web service, shared by every worker thread and
+# every running muse-cli process.
+#
+# Bucket state lives in ~/.config/muse-cli/ratelimit.db. Taking a token is a
+# single short write transaction that *reserves* a send time: the bucket may
+# go negative, and the caller sleeps off the debt after the transaction has
+# committed. No lock is held while sleeping or during the request itself, so
+# N workers share the full rate instead of queueing behind one lock.
+#
+# When a service answers 429/503 its effective rate is halved (down to
+# MIN_FACTOR) and requests pause for the Retry-After time; the rate then
+# doubles back every RECOVERY_SECONDS without further errors.
+
+# service: (requests per second, burst)
+DEFAULT_LIMITS = {
+    "musicbrainz": (1.0, 1),
+    "genius":      (2.0, 4),
+    "youtube":     (2.0, 4),
+}
+
+MIN_FACTOR = 1 / 16
+RECOVERY_SECONDS = 60
+DEFAULT_BACKOFF = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    service      TEXT PRIMARY KEY,
+    tokens       REAL NOT NULL,
+    updated_at   REAL NOT NULL,
+    factor       REAL NOT NULL,
+    penalized_at REAL NOT NULL,
+    blocked_until REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def http_status(exc: BaseException) -> int | None:
+    """Best-effort HTTP status of an exception raised by urllib, requests
+    or yt-dlp."""
+    for e in (exc, getattr(exc, "cause", None), getattr(exc, "__cause__", None)):
+        if e is None:
+            continue
+        code = getattr(e, "code", None) or getattr(
+            getattr(e, "response", None), "status_code", None
+        )
+        if isinstance(code, int):
+            return code
+    m = re.search(r"\b(429|503)\b", str(exc))
+    return int(m.group(1)) if m else None
+
+
+def retry_after(exc) -> float | None:
+    """Retry-After seconds from a response, or from the response attached
+    to an exception, if any. Accepts both seconds and an HTTP date."""
+    for e in (exc, getattr(exc, "cause", None)):
+        headers = getattr(e, "headers", None) or getattr(
+            getattr(e, "response", None), "headers", None
+        )
+        value = str(headers.get("Retry-After") or "").strip() if headers else ""
+        if value.isdigit():
+            return float(value)
+        if value:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+class RateLimiter:
+    """Token bucket for one service.
+
+    Usage:
+        limiter.acquire()            # sleeps until a request may be sent
+        try:
+            do_request()
+        except Exception as e:
+            if http_status(e) in (429, 503):
+                limiter.backoff(retry_after(e))
+    """
+
+    def __init__(self, db: Database, service: str, rate: float, burst: int):
+        self.db = db
+        self.service = service
+        self.rate = rate
+        self.burst = max(1, burst)
+
+    def _factor(self, factor: float, penalized_at: float, now: float) -> float:
+        recovered = factor * 2 ** ((now - penalized_at) / RECOVERY_SECONDS)
+        return min(1.0, recovered)
+
+    def _load(self, conn, now: float):
+        row = conn.execute(
+            "SELECT tokens, updated_at, factor, penalized_at, blocked_until "
+            "FROM buckets WHERE service = ?", (self.service,)
+        ).fetchone()
+        if row is None:
+            return float(self.burst), now, 1.0, now, 0.0
+        return row
+
+    def _store(self, conn, tokens, updated_at, factor, penalized_at, blocked_until):
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?, ?, ?)",
+            (self.service, tokens, updated_at, factor, penalized_at, blocked_until),
+        )
+
+    def acquire(self):
+        """Reserve one request and sleep until it may be sent."""
+        with self.db.transaction() as conn:
+            now = time.time()
+            tokens, updated_at, factor, penalized_at, blocked_until = self._load(conn, now)
+            rate = self.rate * self._factor(factor, penalized_at, now)
+            tokens = min(self.burst, tokens + max(0.0, now - updated_at) * rate)
+            tokens -= 1
+            self._store(conn, tokens, now, factor, penalized_at, blocked_until)
+        # Requests reserved while the service is paused queue up behind it
+        wait = max(0.0, blocked_until - now) + max(0.0, -tokens / rate)
+        if wait > 0:
+            time.sleep(wait)
+
+    def backoff(self, seconds: float | None = None):
+        """The service pushed back (429/503): halve the rate and pause."""
+        with self.db.transaction() as conn:
+            now = time.time()
+            tokens, updated_at, factor, penalized_at, blocked_until = self._load(conn, now)
+            factor = max(MIN_FACTOR, self._factor(factor, penalized_at, now) / 2)
+            pause = seconds if seconds is not None else DEFAULT_BACKOFF / factor
+            self._store(conn, min(tokens, 0.0), now, factor, now,
+                        max(blocked_until, now + pause))
+
+
+_db = None
+_limiters = {}
+_limits = dict(DEFAULT_LIMITS)
+_lock = threading.Lock()
+
+
+def configure(state_dir: str, limits: dict | None = None):
+    """Set where bucket state is shared and override per-service rates,
+    e.g. {"youtube": 1} or {"genius": [2, 4]} (called once at startup)."""
+    global _db
+    with _lock:
+        _db = Database(os.path.join(state_dir, "ratelimit.db"), _SCHEMA)
+        _limiters.clear()
+        _limits.clear()
+        _limits.update(DEFAULT_LIMITS)
+        for service, value in (limits or {}).items():
+            if isinstance(value, (int, float)):
+                value = (float(value), _limits.get(service, (1.0, 1))[1])
+            _limits[service] = (float(value[0]), int(value[1]))
+
+
+def limiter(service: str) -> RateLimiter:
+    """The shared limiter for `service`."""
+    global _db
+    with _lock:
+        lim = _limiters.get(service)
+        if lim is None:
+            if _db is None:
+                from .config import CONFIG_DIR
+                os.makedirs(CONFIG_DIR, exist_ok=True)
+                _db = Database(os.path.join(CONFIG_DIR, "ratelimit.db"), _SCHEMA)
+            rate, burst = _limits.get(service, (1.0, 1))
+            lim = _limiters[service] = RateLimiter(_db, service, rate, burst)
+        return lim
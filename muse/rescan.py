@@ -0,0 +1,176 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from functools import partial
+
+from .duplicate import audio_payload_size, audio_hash
+from .colors import CYAN, GREEN, YELLOW, DIM, RESET
+
+# `muse-cli --rescan`: bring the duplicate database in line with what is
+# actually in the music folder.
+#
+#   1. Walk output_base with os.scandir (one stat per entry, no per-file
+#      os.path calls).
+#   2. Read the audio payload length of every file — a few header reads.
+#   3. Hash only files whose payload length collides with another file
+#      (on disk, or a vanished file we already have a hash for). A file with
+#      a unique length cannot be a duplicate; it is hashed later, on demand,
+#      if a download with the same length ever shows up. Files whose device,
+#      inode, size and mtime match the hash cache are never re-read.
+#   4. Apply everything in one transaction: new hashes, moved files
+#      (matched by hash to a vanished path), stale entries.
+#
+# Steps 2 and 3 run in a process pool so hashing is not limited to one core.
+
+AUDIO_EXTENSIONS = (".m4a", ".mp3", ".mp4", ".aac", ".alac", ".flac", ".opus", ".ogg", ".wav")
+
+
+def _walk(root: str):
+    """Yield (path, stat) for every audio file under root."""
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                        yield entry.path, entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+
+
+def _payload_size(path: str) -> int | None:
+    try:
+        return audio_payload_size(path)
+    except Exception:
+        return None
+
+
+def _hash(path: str, algorithm: str = "sha256") -> str | None:
+    try:
+        return audio_hash(path, algorithm)
+    except Exception:
+        return None
+
+
+def rescan_library(duplicate_checker, output_base: str, workers: int | None = None):
+    """Scan output_base and reconcile the duplicate database with it."""
+    print(f"{CYAN}🔎 Scanning {output_base}...{RESET}")
+    start = time.monotonic()
+
+    files = dict(_walk(output_base))
+    paths = list(files)
+    total_bytes = sum(st.st_size for st in files.values())
+
+    recorded_sizes, recorded_hashes, recorded_paths = duplicate_checker.library_snapshot()
+    hash_cache = duplicate_checker.hash_cache_snapshot()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        sizes = {
+            path: size
+            for path, size in zip(paths, pool.map(_payload_size, paths, chunksize=256))
+            if size is not None
+        }
+
+        # Hashes we already have stay valid while the payload length matches;
+        # one without a recorded length can't be checked and is redone
+        hashes = {
+            path: recorded_hashes[path] for path, size in sizes.items()
+            if path in recorded_hashes and recorded_sizes.get(path) == size
+        }
+        for path in sizes:
+            st = files[path]
+            cached = hash_cache.get((st.st_dev, st.st_ino))
+            if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+                hashes.setdefault(path, cached[2])
+        stale = [p for p in recorded_paths if p not in files]
+
+        by_size = {}
+        for path, size in sizes.items():
+            by_size.setdefault(size, []).append(path)
+        # Files the size of a vanished one may be it, moved; hashing them
+        # also registers a hash for entries that never had one
+        vanished_sizes = {recorded_sizes[p] for p in stale if p in recorded_sizes}
+        to_hash = [
+            path for size, group in by_size.items()
+            if len(group) > 1 or size in vanished_sizes
+            for path in group if path not in hashes
+        ]
+        new_hashes = {
+            path: h
+            for path, h in zip(to_hash, pool.map(
+                partial(_hash, algorithm=duplicate_checker.hash_algorithm),
+                to_hash, chunksize=4,
+            ))
+            if h
+        }
+    hashes.update(new_hashes)
+    # Hashed now or found in the hash cache, but not registered yet
+    unregistered = {p: h for p, h in hashes.items() if recorded_hashes.get(p) != h}
+    # Registered hashes that couldn't be confirmed: dropped, so the file is
+    # rehashed on demand
+    unconfirmed = [p for p in sizes if p in recorded_hashes and p not in hashes]
+
+    # A vanished file whose audio reappears under a new, unregistered path
+    # was moved: keep its video ID entry and point it at the new path.
+    vanished_by_hash = {recorded_hashes[p]: p for p in stale if p in recorded_hashes}
+    moved = {}
+    for path, h in unregistered.items():
+        old = vanished_by_hash.pop(h, None)
+        if old and path not in recorded_paths:
+            moved[old] = path
+
+    # Entries without a hash (imported from hashes.txt, or registered before
+    # the file could be hashed) can only be matched by payload size: a size
+    # shared by exactly one of them and one new file is taken as a move.
+    unmatched = {}
+    for p in stale:
+        if p not in recorded_hashes and p not in moved and p in recorded_sizes:
+            unmatched.setdefault(recorded_sizes[p], []).append(p)
+    if unmatched:
+        claimed = set(moved.values())
+        registered = set(recorded_hashes.values())
+        candidates = {}
+        for path, size in sizes.items():
+            if (size in unmatched and path not in recorded_paths
+                    and path not in claimed and hashes.get(path) not in registered):
+                candidates.setdefault(size, []).append(path)
+        for size, olds in unmatched.items():
+            news = candidates.get(size, [])
+            if len(olds) == 1 and len(news) == 1:
+                moved[olds[0]] = news[0]
+    stale = [p for p in stale if p not in moved]
+
+    duplicate_checker.reconcile(sizes, unregistered, moved, stale,
+                                stats=files, file_hashes=hashes,
+                                unhashed=unconfirmed)
+    elapsed = max(time.monotonic() - start, 1e-6)
+
+    # ── Summary ──────────────────────────────────────────────────────────────
+    groups = {}
+    for path, h in hashes.items():
+        groups.setdefault(h, []).append(path)
+    duplicates = [sorted(g) for g in groups.values() if len(g) > 1]
+
+    mb = total_bytes / (1024 * 1024)
+    hashed_mb = sum(files[p].st_size for p in to_hash) / (1024 * 1024)
+    print(f"{GREEN}✅ {len(paths)} files ({mb:.0f} MB) in {elapsed:.1f}s — "
+          f"{len(paths) / elapsed:.0f} files/s, {mb / elapsed:.0f} MB/s{RESET}")
+    print(f"{DIM}   Hashed {len(to_hash)} files with colliding sizes ({hashed_mb:.0f} MB){RESET}")
+    known = set(recorded_hashes.values())
+    moved_to = set(moved.values())
+    added = len({h for p, h in unregistered.items()
+                 if h not in known and p not in moved_to})
+    print(f"{DIM}   {added} new · {len(moved)} moved · {len(stale)} stale removed{RESET}")
+    if duplicates:
+        print(f"{YELLOW}⚠  {len(duplicates)} sets of identical audio:{RESET}")
+        for group in duplicates:
+            print(f"{DIM}   {' = '.join(os.path.relpath(p, output_base) for p in group)}{RESET}")
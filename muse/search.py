@@ -1,9 +1,11 @@
 import subprocess
 import re
+import json
+import threading
 
+from .cache import DiskCache, DAY
 from .colors import CYAN, WHITE, GREEN, YELLOW, RED, RESET
-
-_DELIM = "|||"
+from .engine import get_engine
 
 
 def _clean_uploader(uploader: str) -> str:
@@ -21,54 +23,168 @@ def _clean_uploader(uploader: str) -> str:
     return uploader.strip()
 
 
+# ── Result cache ──────────────────────────────────────────────────────────────
+#
+# Parsed results are cached on disk by normalized query and result count, so
+# re-running a batch file or repeating a `search` skips yt-dlp entirely.
+# YouTube rankings drift and videos get taken down, so results are kept for a
+# week; queries with no results are cached for a day. Failed searches are
+# never cached.
+
+HIT_TTL  = 7 * DAY
+MISS_TTL = 1 * DAY
+
+_cache = None
+
+
+def configure_cache(path: str, max_bytes: int = 128 << 20):
+    """Enable the search result cache (called once at startup)."""
+    global _cache
+    _cache = DiskCache(path, "youtube_search", max_bytes=max_bytes)
+
+
+def _cache_key(query: str, max_results: int) -> str:
+    # YouTube search ignores case and spacing
+    return json.dumps([" ".join(query.casefold().split()), max_results])
+
+
 def search_youtube(query: str, max_results: int = 5) -> list:
     """Search YouTube and return list of results."""
-    search_cmd = [
-        "yt-dlp",
-        f"ytsearch{max_results}:{query}",
-        "--print", f"%(id)s{_DELIM}%(title)s{_DELIM}%(uploader)s{_DELIM}%(duration_string)s",
-        "--skip-download",
-        "--no-warnings",
-        "--add-header", "Accept-Language:en-US,en;q=0.9",
-        "--extractor-args", "youtube:lang=en",
-    ]
+    key = _cache_key(query, max_results)
+    if _cache:
+        hit, results = _cache.get(key)
+        if hit:
+            return results or []
+
+    results = _search(query, max_results)
+    if _cache and results is not None:
+        _cache.set(key, results, ttl=HIT_TTL if results else MISS_TTL)
+    return results or []
+
+
+def _parse_entries(entries: list) -> list:
+    results = []
+    for entry in entries:
+        video_id = (entry.get("id") or "").strip()
+        if not video_id:
+            continue
+        title = entry.get("title") or ""
+        # Clean the title — strip "| ALBUM" bleed
+        clean_title    = title.split('|')[0].strip()
+        clean_uploader = _clean_uploader(entry.get("uploader") or "")
+        results.append({
+            "title":    clean_title,
+            "raw_title": title.strip(),
+            "uploader": clean_uploader,
+            "duration": (entry.get("duration_string") or "").strip(),
+            "id":       video_id,
+            "url":      f"https://www.youtube.com/watch?v={video_id}",
+            # Raw fields in yt-dlp naming, handed to download_song so it
+            # doesn't have to extract the same info again
+            # (artist and thumbnail only when the engine reported them;
+            # flat search results don't have them)
+            "info": {
+                "id":       video_id,
+                "title":    title.strip(),
+                "uploader": entry.get("uploader"),
+                "channel":  entry.get("channel"),
+                **{f: entry[f] for f in ("artist", "thumbnail") if f in entry},
+            },
+        })
+    return results
+
 
+def _search(query: str, max_results: int) -> list | None:
+    """Live search; None when yt-dlp failed."""
     try:
-        result = subprocess.run(
-            search_cmd,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=30
-        )
-
-        lines = result.stdout.strip().split("\n")
-        results = []
-
-        for line in lines:
-            if line and _DELIM in line:
-                parts = line.split(_DELIM, 3)
-                if len(parts) >= 4:
-                    video_id, title, uploader, duration = parts
-                    # Clean the title — strip "| ALBUM" bleed
-                    clean_title    = title.split('|')[0].strip()
-                    clean_uploader = _clean_uploader(uploader)
-                    results.append({
-                        "title":    clean_title,
-                        "raw_title": title.strip(),
-                        "uploader": clean_uploader,
-                        "duration": duration.strip(),
-                        "id":       video_id.strip(),
-                        "url":      f"https://www.youtube.com/watch?v={video_id.strip()}"
-                    })
-
-        return results
+        return _parse_entries(get_engine().search(query, max_results))
     except subprocess.CalledProcessError as e:
         print(f"{RED}❌ Search failed: {e.stderr.strip() if e.stderr else 'Unknown error'}{RESET}")
-        return []
+        return None
     except Exception as e:
         print(f"{RED}❌ Search failed: {e}{RESET}")
-        return []
+        return None
+
+
+# ── Bulk search ───────────────────────────────────────────────────────────────
+#
+# Batch files resolve all their queries in one yt-dlp run (see
+# engine.search_many) instead of one run per line. Results stream back while
+# earlier songs download, and each song's search just waits for its record.
+
+def search_many(queries: list, max_results: int = 1):
+    """Yield (query, results) for every query: cached ones first, then the
+    rest as yt-dlp resolves them."""
+    pending = []
+    for query in dict.fromkeys(q.strip() for q in queries if q.strip()):
+        hit, results = _cache.get(_cache_key(query, max_results)) if _cache else (False, None)
+        if hit:
+            yield query, results or []
+        else:
+            pending.append(query)
+    if not pending:
+        return
+
+    # The bulk run can't tell "no results" from a failed or mangled search.
+    # Empty records are confirmed (and negative-cached) one by one after the
+    # stream is drained, so they never hold up the records behind them.
+    unconfirmed = []
+    try:
+        for query, entries in get_engine().search_many(pending, max_results):
+            results = _parse_entries(entries or [])
+            if not results:
+                unconfirmed.append(query)
+                continue
+            if _cache:
+                _cache.set(_cache_key(query, max_results), results, ttl=HIT_TTL)
+            yield query, results
+    except Exception as e:
+        print(f"{RED}❌ Search failed: {e}{RESET}")
+    for query in unconfirmed:
+        yield query, search_youtube(query, max_results)
+
+
+class BulkSearch:
+    """Resolves a batch of queries in the background, in one yt-dlp run.
+
+    Usage:
+        bulk = BulkSearch(queries)
+        results = bulk.search(query)    # waits for that query's record
+    """
+
+    def __init__(self, queries: list, max_results: int = 1):
+        self.max_results = max_results
+        self._queries = {q.strip() for q in queries}
+        self._results = {}
+        self._done = False
+        self._cond = threading.Condition()
+        threading.Thread(
+            target=self._run, args=(list(queries),), daemon=True
+        ).start()
+
+    def _run(self, queries: list):
+        try:
+            for query, results in search_many(queries, self.max_results):
+                with self._cond:
+                    self._results[query] = results
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def search(self, query: str, max_results: int = 1) -> list:
+        """Same as search_youtube, answered from the bulk run when it has
+        (or will have) a record for `query`."""
+        query = query.strip()
+        if query in self._queries and max_results == self.max_results:
+            with self._cond:
+                while query not in self._results and not self._done:
+                    self._cond.wait()
+                results = self._results.get(query)
+            if results is not None:
+                return results
+        return search_youtube(query, max_results)
 
 
 def display_search_results(results: list):
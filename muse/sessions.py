@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import ratelimit
+
+# Shared HTTP sessions for the web services muse-cli talks to (Genius,
+# MusicBrainz).
+#
+# One requests.Session per service, with a keep-alive connection pool large
+# enough for every worker thread, so lookups reuse open TLS connections
+# instead of handshaking for each request. Every request sent through a
+# session takes a token from the service's rate limiter first, and
+# transient failures are retried here rather than by each caller:
+#
+#   429 / 503            the service is slowed down for every worker
+#                        (RateLimiter.backoff) for the Retry-After time, or a
+#                        jittered exponential delay when there is none, and
+#                        the request is retried when its turn comes
+#   502 / 504, network   retried after a jittered exponential delay
+#
+# Requests, retries and throttled answers are counted per service.
+#
+# This module imports requests; import it where a session is first needed.
+
+USER_AGENT = "muse-cli/1.0 ( https://github.com/Ulasti/muse-cli )"
+
+POOL_SIZE = 16            # connections kept open per host
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0        # seconds before the first retry, doubled each time
+BACKOFF_MAX = 30.0
+MAX_RETRY_AFTER = 120.0   # longer Retry-After answers are given up on
+
+_RETRY_STATUS = (429, 502, 503, 504)
+_THROTTLE_STATUS = (429, 503)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter, so workers that failed together
+    don't retry together."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _count(service: str, counter: str):
+    with _stats_lock:
+        counters = _stats.setdefault(
+            service, {"requests": 0, "retries": 0, "throttled": 0}
+        )
+        counters[counter] += 1
+
+
+def stats() -> dict:
+    """{service: {"requests", "retries", "throttled"}} since startup."""
+    with _stats_lock:
+        return {service: dict(counters) for service, counters in _stats.items()}
+
+
+class _ServiceAdapter(HTTPAdapter):
+    """Connection pool that rate limits and retries every request."""
+
+    def __init__(self, service: str):
+        super().__init__(pool_connections=4, pool_maxsize=POOL_SIZE)
+        self.service = service
+
+    def send(self, request, **kwargs):
+        limit = ratelimit.limiter(self.service)
+        attempt = 0
+        while True:
+            limit.acquire()
+            _count(self.service, "requests")
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= MAX_RETRIES:
+                    raise
+                _count(self.service, "retries")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code not in _RETRY_STATUS:
+                return response
+            if response.status_code in _THROTTLE_STATUS:
+                _count(self.service, "throttled")
+                wait = ratelimit.retry_after(response)
+                if wait is None:
+                    wait = backoff_delay(attempt)
+                # Pauses every worker; the next acquire() waits it out
+                limit.backoff(min(wait, MAX_RETRY_AFTER))
+                if wait > MAX_RETRY_AFTER:
+                    return response
+            else:
+                time.sleep(backoff_delay(attempt))
+            if attempt >= MAX_RETRIES:
+                return response
+            _count(self.service, "retries")
+            response.close()
+            attempt += 1
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def session(service: str) -> requests.Session:
+    """The shared session for `service` (a ratelimit service name)."""
+    with _sessions_lock:
+        s = _sessions.get(service)
+        if s is None:
+            s = _sessions[service] = requests.Session()
+            s.headers["User-Agent"] = USER_AGENT
+            adapter = _ServiceAdapter(service)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+        return s
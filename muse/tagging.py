@@ -0,0 +1,137 @@
+# mutagen is imported by the save methods, so importing this module (and
+# everything that imports it) stays cheap for runs that never tag a file.
+
+# Padding reserved whenever a save has to grow the tag anyway, so later tag
+# edits (retagging, lyrics added afterwards) fit in place instead of
+# rewriting the whole file.
+TAG_PADDING = 64 * 1024
+
+
+def _padding(info):
+    """mutagen padding callback: write in place when the new tag fits,
+    otherwise grow once and leave TAG_PADDING bytes spare."""
+    if info.padding >= 0:
+        return info.padding
+    return TAG_PADDING
+
+
+class TagWriter:
+    """Collects text tags, cover art and lyrics for one file and writes them
+    with a single save.
+
+    Usage:
+        tags = TagWriter(path, "m4a")
+        tags.set_text(title, artist, album, year)
+        tags.set_source(webpage_url, description)
+        tags.set_cover(jpeg_bytes)
+        tags.set_lyrics(text)
+        tags.save()
+    """
+
+    def __init__(self, filepath: str, audio_format: str):
+        self.filepath = filepath
+        self.audio_format = audio_format
+        self.text = {}
+        self.source = None
+        self.cover = None
+        self.cover_mime = "image/jpeg"
+        self.lyrics = None
+
+    def set_text(self, title: str, artist: str, album: str = "",
+                 year: str = "", genre: str = "Music"):
+        self.text = {"title": title, "artist": artist, "album": album,
+                     "year": year, "genre": genre}
+
+    def set_source(self, url: str, description: str = ""):
+        """Source URL and upload description, the tags yt-dlp's
+        --add-metadata used to write."""
+        self.source = {"url": url, "description": description}
+
+    def set_cover(self, data: bytes, mime: str = "image/jpeg"):
+        self.cover = data
+        self.cover_mime = mime
+
+    def set_lyrics(self, text: str):
+        self.lyrics = text
+
+    @property
+    def empty(self) -> bool:
+        return not (self.text or self.source or self.cover or self.lyrics)
+
+    def save(self):
+        """Write everything collected so far in one save."""
+        if self.empty:
+            return
+        if self.audio_format == "mp3":
+            self._save_id3()
+        else:
+            self._save_mp4()
+
+    def _save_id3(self):
+        from mutagen.mp3 import MP3
+        from mutagen.id3 import (
+            TIT2, TPE1, TALB, TDRC, TCON, APIC, USLT, COMM, WOAS, TXXX
+        )
+
+        audio = MP3(self.filepath)
+        if audio.tags is None:
+            audio.add_tags()
+        id3 = audio.tags
+        t = self.text
+        if t:
+            id3.setall("TIT2", [TIT2(encoding=3, text=[t["title"]])])
+            id3.setall("TPE1", [TPE1(encoding=3, text=[t["artist"]])])
+            id3.setall("TCON", [TCON(encoding=3, text=[t["genre"]])])
+            if t["album"]:
+                id3.setall("TALB", [TALB(encoding=3, text=[t["album"]])])
+            if t["year"]:
+                id3.setall("TDRC", [TDRC(encoding=3, text=[t["year"]])])
+        src = self.source
+        if src:
+            id3.setall("WOAS", [WOAS(url=src["url"])])
+            id3.setall("COMM", [COMM(
+                encoding=3, lang="eng", desc="", text=[src["url"]]
+            )])
+            if src["description"]:
+                id3.delall("TXXX:description")
+                id3.add(TXXX(encoding=3, desc="description",
+                             text=[src["description"]]))
+        if self.cover:
+            id3.setall("APIC", [APIC(
+                encoding=3, mime=self.cover_mime, type=3,
+                desc="Cover", data=self.cover
+            )])
+        if self.lyrics:
+            id3.setall("USLT", [USLT(
+                encoding=3, lang='eng', desc='desc', text=self.lyrics
+            )])
+        audio.save(padding=_padding)
+
+    def _save_mp4(self):
+        from mutagen.mp4 import MP4, MP4Cover
+
+        audio = MP4(self.filepath)
+        if audio.tags is None:
+            audio.add_tags()
+        t = self.text
+        if t:
+            audio["\xa9nam"] = [t["title"]]
+            audio["\xa9ART"] = [t["artist"]]
+            audio["\xa9gen"] = [t["genre"]]
+            if t["album"]:
+                audio["\xa9alb"] = [t["album"]]
+            if t["year"]:
+                audio["\xa9day"] = [t["year"]]
+        src = self.source
+        if src:
+            audio["purl"] = [src["url"]]
+            audio["\xa9cmt"] = [src["url"]]
+            if src["description"]:
+                audio["desc"] = [src["description"]]
+        if self.cover:
+            fmt = (MP4Cover.FORMAT_PNG if self.cover_mime == "image/png"
+                   else MP4Cover.FORMAT_JPEG)
+            audio["covr"] = [MP4Cover(self.cover, imageformat=fmt)]
+        if self.lyrics:
+            audio["\xa9lyr"] = [self.lyrics]
+        audio.save(padding=_padding)
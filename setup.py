@@ -25,9 +25,13 @@ setup(
         "yt-dlp>=2023.3.4",
         "mutagen>=1.47.0",
         "lyricsgenius>=3.0.1",
-        "musicbrainzngs>=0.7.1",
+        "requests>=2.25",
         "Pillow>=9.0.0",
     ],
+    extras_require={
+        "fingerprint": ["numpy>=1.22"],
+        "blake3": ["blake3>=0.3"],
+    },
     entry_points={
         "console_scripts": [
             "muse-cli=muse.__main__:main",